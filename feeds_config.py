@@ -14,6 +14,14 @@ class Feed:
     filter_prompt: str | None = None  # None = no Claude filter, "NOTION" = load from Notion
     archive_days: int = 7
     require_image: bool = False
+    dedup_threshold: float | None = None  # MinHash similarity at which articles count as the same story; None = off
+    prefilter_confidence: float | None = None  # settle articles locally at this model confidence; None = off
+    prefilter_shadow: bool = False  # only compare the local model with Claude, settle nothing
+    filter_model: str = "claude-haiku-4-5-20251001"  # makes the final decision and writes the reason
+    screen_model: str | None = None  # cascade first pass (decision + confidence only); None = single pass
+    screen_confidence: float = 0.8   # screened EXCLUDEs below this confidence go on to filter_model
+    weight: float = 1.0  # share of pass-2 pubDate slots, relative to the other feeds
+    current_items: int | None = None  # page older items into RFC 5005 archive pages; None = one document
 
 
 FEEDS = [
@@ -27,13 +35,16 @@ FEEDS = [
             RSSSource("NYT",         "https://rss.nytimes.com/services/xml/rss/nyt/HomePage.xml"),
             RSSSource("CBCCanada",   "https://www.cbc.ca/cmlink/rss-canada"),
             RSSSource("NPRPolitics", "https://feeds.npr.org/1014/rss.xml"),
-            RSSSource("Verge",       "https://www.theverge.com/rss/index.xml"),
-            RSSSource("Ars",         "https://feeds.arstechnica.com/arstechnica/index"),
+            RSSSource("Verge",       "https://www.theverge.com/rss/index.xml", chronological=True),
+            RSSSource("Ars",         "https://feeds.arstechnica.com/arstechnica/index", chronological=True),
             RSSSource("CBCToronto",  "https://www.cbc.ca/cmlink/rss-canada-toronto"),
-            RSSSource("Spacing",     "https://spacing.ca/toronto/feed/"),
+            RSSSource("Spacing",     "https://spacing.ca/toronto/feed/", chronological=True),
         ],
         filter_prompt="NOTION",
         archive_days=7,
+        dedup_threshold=0.5,  # wire stories syndicated across BBC, Guardian, NYT, CBC
+        prefilter_confidence=0.95,
+        prefilter_shadow=True,
     ),
     Feed(
         name="toronto_raves",
@@ -49,6 +60,9 @@ FEEDS = [
             "general discussion, gear questions, music releases, and set recordings."
         ),
         archive_days=30,
+        current_items=50,
+        prefilter_confidence=0.95,
+        prefilter_shadow=True,
     ),
     Feed(
         name="toronto_events",
@@ -73,35 +87,38 @@ FEEDS = [
             "Fort York, Liberty Village."
         ),
         archive_days=30,
+        current_items=50,
     ),
     Feed(
         name="media_recs",
         title="Media Recommendations",
         description="Curated book, game, and film recommendations filtered to personal taste",
         sources=[
-            RSSSource("ReactorMag",  "https://reactormag.com/feed/"),
+            RSSSource("ReactorMag",  "https://reactormag.com/feed/", chronological=True),
             RSSSource("RogerEbert",  "https://www.rogerebert.com/feed",
                       fallback_image="https://www.rogerebert.com/wp-content/uploads/2024/08/ebert-share-image-6ac60e3bf8145b9078bae64905b62f455a2777c754d071317a46d6886ccc74f1-jpg.webp"),
             RSSSource("Eurogamer",   "https://www.eurogamer.net/feed"),
             RSSSource("AVClub",      "https://www.avclub.com/rss"),
-            RSSSource("Slant",       "https://www.slantmagazine.com/feed/"),
+            RSSSource("Slant",       "https://www.slantmagazine.com/feed/", chronological=True),
         ],
         filter_prompt="TASTE_PROFILE",
         archive_days=30,
+        current_items=50,
     ),
     Feed(
         name="fun",
         title="Comics & Lighthearted",
         description="Webcomics and lighthearted content",
         sources=[
-            RSSSource("XKCD",           "https://xkcd.com/rss.xml"),
+            RSSSource("XKCD",           "https://xkcd.com/rss.xml", chronological=True),
             RSSSource("ThreeWordPhrase", "https://threewordphrase.com/rss.xml", fetch_page_image=True),
             RSSSource("Buttersafe",      "http://feeds.feedburner.com/buttersafe", fetch_page_image=True, page_image_id="comic"),
-            RSSSource("PBF",            "https://pbfcomics.com/feed/"),
+            RSSSource("PBF",            "https://pbfcomics.com/feed/", chronological=True),
             RSSSource("WebComicName",   "https://webcomicname.com/rss"),
         ],
         filter_prompt=None,
         archive_days=180,
+        current_items=30,
         require_image=True,
     ),
     Feed(
@@ -111,6 +128,7 @@ FEEDS = [
         sources=[BlizzardSource()],
         filter_prompt=None,
         archive_days=30,
+        current_items=20,
     ),
     Feed(
         name="shambhala",
@@ -119,5 +137,6 @@ FEEDS = [
         sources=[ShambhalaSource()],
         filter_prompt=None,
         archive_days=90,
+        current_items=20,
     ),
 ]
@@ -0,0 +1,131 @@
+"""
+llm.py — Rate-limit-aware Anthropic client shared by every feed in a run
+
+Wraps Anthropic().messages.create so concurrent filter batches can share one
+client safely:
+  - a token bucket caps the request rate across all feeds and threads
+  - 429 / overloaded responses are retried after the server's retry-after
+    delay (or an exponential backoff), and the wait pauses the whole bucket
+    so other threads don't pile onto the limit in the meantime
+  - a timeout= argument bounds the whole call, rate-limit waits and retries
+    included, not just each HTTP request
+
+UsageStats tallies token counts, prompt-cache hits and request latency per feed
+(or per filter tier).
+"""
+
+import time
+import threading
+
+from anthropic import Anthropic, APIStatusError, RateLimitError
+
+REQUESTS_PER_MINUTE = 50
+MAX_RETRIES         = 4
+RETRY_STATUSES      = {429, 500, 502, 503, 529}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate     = rate
+        self.capacity = capacity
+        self.tokens   = capacity
+        self.updated  = time.monotonic()
+        self.paused_until = 0.0
+        self.lock     = threading.Lock()
+
+    def acquire(self, until=None):
+        """Take a token, waiting as needed. Raises TimeoutError rather than wait past `until` (monotonic)."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if until is not None and now >= until:
+                    raise TimeoutError("deadline passed waiting for the rate limit")
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            if until is not None and now + wait >= until:
+                raise TimeoutError("deadline passed waiting for the rate limit")
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds`, e.g. after a 429."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def _retry_after(error):
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class RateLimitedClient:
+    """Drop-in for the `client.messages.create(...)` calls made by the pipeline."""
+
+    def __init__(self, client=None, requests_per_minute=REQUESTS_PER_MINUTE, max_retries=MAX_RETRIES):
+        # The SDK's own retries would bypass the shared bucket, so they're disabled here
+        self.client      = client or Anthropic(max_retries=0)
+        self.bucket      = TokenBucket(requests_per_minute / 60, capacity=max(1, requests_per_minute // 10))
+        self.max_retries = max_retries
+        self.messages    = self
+
+    def create(self, **kwargs):
+        timeout = kwargs.get("timeout")
+        until   = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(until)
+            if until is not None:
+                kwargs["timeout"] = until - time.monotonic()
+            try:
+                return self.client.messages.create(**kwargs)
+            except APIStatusError as e:
+                wait = _retry_after(e) or 2 ** attempt
+                if attempt == self.max_retries or e.status_code not in RETRY_STATUSES:
+                    raise
+                if until is not None and time.monotonic() + wait >= until:
+                    raise
+                kind = "rate limited" if isinstance(e, RateLimitError) else f"HTTP {e.status_code}"
+                print(f"  Claude {kind}, retrying in {wait:.0f}s")
+                self.bucket.pause(wait)
+
+
+class UsageStats:
+    """Thread-safe tally of token usage, prompt-cache hits and latency for one feed or tier."""
+
+    def __init__(self):
+        self.requests      = 0
+        self.cache_hits    = 0
+        self.input_tokens  = 0
+        self.cache_read    = 0
+        self.cache_write   = 0
+        self.output_tokens = 0
+        self.seconds       = 0.0
+        self.lock          = threading.Lock()
+
+    def record(self, response, seconds=0.0):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        with self.lock:
+            self.requests      += 1
+            self.seconds       += seconds
+            self.input_tokens  += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+            self.cache_read    += getattr(usage, "cache_read_input_tokens", 0) or 0
+            self.cache_write   += getattr(usage, "cache_creation_input_tokens", 0) or 0
+            if getattr(usage, "cache_read_input_tokens", 0):
+                self.cache_hits += 1
+
+    def __str__(self):
+        return (
+            f"{self.requests} requests, cache {self.cache_hits} hit / {self.requests - self.cache_hits} miss, "
+            f"input {self.input_tokens} + {self.cache_read} cached read + {self.cache_write} cache write, "
+            f"output {self.output_tokens} tokens, {self.seconds / max(self.requests, 1):.1f}s avg latency"
+        )
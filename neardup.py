@@ -0,0 +1,106 @@
+"""
+neardup.py — MinHash/LSH near-duplicate detection across sources and runs
+
+Each article's title and description are reduced to a set of content words and
+summarised as a NUM_PERM-value MinHash signature; the fraction of positions two
+signatures agree on estimates the Jaccard similarity of their word sets. The
+signature is cut into BANDS bands, and articles that share any band land in the
+same bucket, so finding candidates is a bucket lookup rather than a scan of the
+archive. Candidates are then checked against the feed's threshold.
+
+Signatures and buckets are persisted in the ArticleStore next to the feed's
+archive (see ArticleStore.similar / add_signatures), so a story that was already
+seen on an earlier day is caught as well as one repeated by another source today.
+"""
+
+import re
+import random
+import hashlib
+from array import array
+
+NUM_PERM = 64
+BANDS    = 32  # 2 rows per band: pairs around 0.3 similarity already collide in some band
+PRIME    = (1 << 61) - 1
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this
+to was were will with after over into new says say said how why what who you your
+""".split())
+
+_rng   = random.Random(5381)
+_PERMS = [(_rng.randrange(1, PRIME), _rng.randrange(PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text):
+    """Lowercase content words of text, without stopwords and one-letter tokens."""
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 1 and w not in STOPWORDS}
+
+
+def signature(text):
+    """MinHash signature of text's word set, or None if it has no content words."""
+    words = shingles(text)
+    if not words:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "big") for w in words]
+    return array("Q", (min((a * h + b) % PRIME for h in hashes) for a, b in _PERMS))
+
+
+def buckets(sig):
+    """One bucket id per band, as signed 64-bit ints so SQLite can index them."""
+    rows = NUM_PERM // BANDS
+    return [
+        int.from_bytes(
+            hashlib.blake2b(sig[i:i + rows].tobytes(), digest_size=8, person=bytes([i // rows])).digest(),
+            "big", signed=True,
+        )
+        for i in range(0, NUM_PERM, rows)
+    ]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the word sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def article_text(article):
+    return f"{article.title} {article.desc}"
+
+
+class NearDupIndex:
+    """One feed's near-duplicate check for a run.
+
+    Queries the feed's persisted signatures plus those of the articles already let
+    through this run; save() persists this run's signatures once the feed finishes.
+    """
+
+    def __init__(self, store, feed, threshold):
+        self.store     = store
+        self.feed      = feed
+        self.threshold = threshold
+        self.sigs      = {}  # guid → signature, for this run's articles
+        self.buckets   = {}  # bucket → [guid], for this run's articles
+        self.dropped   = 0
+
+    def _match(self, guid, sig, keys):
+        candidates = {g: self.sigs[g] for k in keys for g in self.buckets.get(k, ())}
+        candidates.update(self.store.similar(self.feed, keys))
+        candidates.pop(guid, None)
+        return next((g for g, other in candidates.items() if similarity(sig, other) >= self.threshold), None)
+
+    def filter(self, articles):
+        """Return the articles that aren't near-duplicates of one already indexed, indexing those."""
+        out = []
+        for a in articles:
+            sig = signature(article_text(a))
+            if sig is not None:
+                keys = buckets(sig)
+                if self._match(a.guid, sig, keys):
+                    self.dropped += 1
+                    continue
+                self.sigs[a.guid] = sig
+                for k in keys:
+                    self.buckets.setdefault(k, []).append(a.guid)
+            out.append(a)
+        return out
+
+    def save(self, now=None):
+        self.store.add_signatures(self.feed, [(g, sig, buckets(sig)) for g, sig in self.sigs.items()], now)
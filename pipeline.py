@@ -3,41 +3,81 @@
 pipeline.py — Unified RSS feed pipeline
 
 For each feed defined in feeds_config.py:
-  1. Fetch all sources
-  2. Skip articles already in the rolling archive
-  3. Run Claude filter (if configured)
-  4. Merge new articles into archive, prune old ones
-  5. Write output/<name>.xml from the archive
+  1. Fetch all sources (every feed's sources run concurrently)
+  2. Scrape images for each source's new articles on its fetch worker; as each
+     source returns, skip articles already in the rolling archive or
+     near-duplicates of one seen before (neardup.py)
+  3. Run Claude filter (if configured) on full batches while other sources are
+     still fetching, reusing decisions from the per-feed ledger and letting the
+     local prefilter (prefilter.py) settle the ones it is sure about
+  4. Merge new articles into the SQLite archive (output/archive.db), prune old ones
+  5. Write output/<name>.xml and <name>.json from the archive, paging older articles of
+     long-retention feeds into immutable RFC 5005 archive pages
+  6. Merge every feed into output/all.xml and all.json
 
 Feeds with filter_prompt=None skip Claude and write source output directly.
 """
 
 import os
 import re
+import sys
 import json
+import time
 import hashlib
-import requests
+import threading
+import functools
+import heapq
+import itertools
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta, UTC
-from email.utils import parsedate_to_datetime
+from dataclasses import replace
+from datetime import datetime, UTC
 from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
 
-from anthropic import Anthropic
 import argparse
-from feeds_config import FEEDS
-from sources.rss import _scraper
+from anthropic import APIError
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from feeds_config import FEEDS, Feed
+from llm import RateLimitedClient, UsageStats
+from neardup import NearDupIndex
+from prefilter import train_from_ledger
+from publish import variants, write_build_marker, write_if_changed
+from sources import health, http_cache, transport
+from sources.article import Article, rfc822
+from store import ArticleStore
 
 MEDIA_NS              = "http://search.yahoo.com/mrss/"
+ATOM_NS               = "http://www.w3.org/2005/Atom"
+FH_NS                 = "http://purl.org/syndication/history/1.0"
+SITE_URL              = "https://justinlycklama.github.io/rss-digest/"
 OUTPUT_DIR            = Path("output")
-BATCH_SIZE            = 20
+HTTP_CACHE_PATH       = OUTPUT_DIR / "http_cache.json"
+ARCHIVE_DB            = OUTPUT_DIR / "archive.db"
+CF_SESSION_PATH       = OUTPUT_DIR / "cf_session.json"  # kept out of gh-pages, see daily.yml
+HEALTH_PATH           = OUTPUT_DIR / "source_health.json"
+BUILD_MARKER_PATH     = OUTPUT_DIR / "build.json"  # rewritten last; serve.py swaps builds when it changes
+PROFILE_CACHE_PATH    = OUTPUT_DIR / "profile_cache.json"  # private Notion content, kept out of gh-pages
+PROFILE_TTL           = 3 * 86400  # cached profile parts older than this are refetched regardless
+MAX_OUTPUT_TOKENS     = 2048   # max_tokens for each filter request
+MAX_INPUT_TOKENS      = 12000  # article-list budget per filter request; the cached filter context doesn't count
+OUTPUT_FILL           = 0.8    # fraction of MAX_OUTPUT_TOKENS a batch is packed to
+TOKENS_PER_DECISION   = 45     # {"id", "decision", "reason"} object for one article
+TOKENS_PER_TYPE       = 8      # extra "type" field when classifying media
+TOKENS_PER_SCREEN     = 18     # {"id", "decision", "confidence"} object from the screening pass
+MIN_CACHE_TOKENS      = 4096   # shortest system prompt Haiku will cache
+FETCH_WORKERS         = 16
+FILTER_WORKERS        = 4
+SLOT_SECONDS          = 600    # spacing between pass-2 pubDate slots
+ARCHIVE_PAGE_SIZE     = 100    # articles per RFC 5005 archive page
+ALL_MAX_ITEMS         = 200    # newest articles kept in the combined all.xml / all.json
+ALL_FEED              = Feed(name="all", title="All Feeds", description="Every digest feed, merged", sources=[])
+STAGE_SHARES          = {"fetch": 0.4, "filter": 0.9, "write": 1.0}  # cumulative share of --deadline
 NOTION_TOKEN          = os.environ.get("NOTION_TOKEN")
 FILTER_PAGE_ID        = "33ba1339f88a81799204f8b0d4a1ca71"
 MEDIA_RECS_FILTER_ID  = "398a1339f88a819ca5d4c6491a4d7230"
 MEDIA_COLLECTION_ID   = "1482e7dbf30d47409a002ab3413d8177"
 GOODREADS_RSS         = "https://www.goodreads.com/review/list_rss/197955244?shelf=read"
 
-ET.register_namespace("media", MEDIA_NS)
-
 
 # --- NOTION ---
 DEFAULT_FILTER_CONTEXT = """
@@ -62,20 +102,62 @@ EXCLUDE:
 SIGNIFICANCE TEST: Would this story still matter in a week? If no, exclude it.
 """
 
+def _notion_headers():
+    return {
+        "Authorization": f"Bearer {NOTION_TOKEN}",
+        "Notion-Version": "2022-06-28",
+        "Content-Type": "application/json",
+    }
+
+def _notion_results(url, query=None):
+    """Every result of a paginated Notion endpoint, following next_cursor while has_more.
+
+    Block children are listed with GET; pass a query dict to POST a database query instead.
+    """
+    results, cursor = [], None
+    while True:
+        page = {"page_size": 100, **({"start_cursor": cursor} if cursor else {})}
+        if query is None:
+            r = transport.get(url, headers=_notion_headers(), params=page)
+        else:
+            r = transport.post(url, headers=_notion_headers(), json={**query, **page})
+        r.raise_for_status()
+        data = r.json()
+        results += data.get("results", [])
+        if not data.get("has_more") or not data.get("next_cursor"):
+            return results
+        cursor = data["next_cursor"]
+
+def _notion_page_edited(page_id):
+    """last_edited_time of a Notion page, or None if it can't be checked."""
+    try:
+        r = transport.get(f"https://api.notion.com/v1/pages/{page_id}", headers=_notion_headers())
+        r.raise_for_status()
+        return r.json().get("last_edited_time")
+    except Exception as e:
+        print(f"  Could not check Notion page {page_id}: {e}")
+        return None
+
+def _notion_database_edited(database_id):
+    """last_edited_time of the most recently edited row in a Notion database, or None if it can't be checked."""
+    try:
+        r = transport.post(
+            f"https://api.notion.com/v1/databases/{database_id}/query", headers=_notion_headers(),
+            json={"sorts": [{"timestamp": "last_edited_time", "direction": "descending"}], "page_size": 1},
+        )
+        r.raise_for_status()
+        rows = r.json().get("results", [])
+        return rows[0].get("last_edited_time") if rows else ""
+    except Exception as e:
+        print(f"  Could not check Notion database {database_id}: {e}")
+        return None
+
 def _fetch_notion_page_text(page_id):
     """Return plain text content of a Notion page, or None on failure."""
-    if not NOTION_TOKEN:
-        return None
     try:
         url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-        headers = {
-            "Authorization": f"Bearer {NOTION_TOKEN}",
-            "Notion-Version": "2022-06-28",
-        }
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()
         lines = []
-        for block in r.json().get("results", []):
+        for block in _notion_results(url):
             btype = block.get("type")
             rich  = block.get(btype, {}).get("rich_text", [])
             text  = "".join(t.get("plain_text", "") for t in rich)
@@ -86,11 +168,19 @@ def _fetch_notion_page_text(page_id):
         print(f"  Could not fetch Notion page {page_id}: {e}")
         return None
 
+def notion_page_text(page_id):
+    """_fetch_notion_page_text, through the profile cache: refetched only once the page is edited."""
+    if not NOTION_TOKEN:
+        return None
+    return cached_part(f"notion_page:{page_id}", lambda: _fetch_notion_page_text(page_id),
+                       lambda: _notion_page_edited(page_id))
+
+@functools.cache
 def load_notion_filter():
     if not NOTION_TOKEN:
         print("  No NOTION_TOKEN, using default filter context")
         return DEFAULT_FILTER_CONTEXT
-    text = _fetch_notion_page_text(FILTER_PAGE_ID)
+    text = notion_page_text(FILTER_PAGE_ID)
     if text:
         print("  Loaded filter context from Notion")
         return text
@@ -98,13 +188,58 @@ def load_notion_filter():
     return DEFAULT_FILTER_CONTEXT
 
 
-# --- TASTE PROFILE ---
-def load_taste_profile():
-    parts = []
+# --- PROFILE CACHE ---
+# Notion pages, the Notion media collection and Goodreads ratings change far less
+# often than daily, so each is cached in PROFILE_CACHE_PATH between runs.
+_profile_cache = {}
+_profile_lock  = threading.Lock()
 
-    # Goodreads — books rated 4 or 5 stars
+def load_profile_cache():
+    global _profile_cache
+    try:
+        with open(PROFILE_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    except Exception as e:
+        print(f"  Could not load profile cache: {e} — starting fresh")
+        data = {}
+    with _profile_lock:
+        _profile_cache = data
+
+def save_profile_cache():
+    with _profile_lock:
+        data = dict(_profile_cache)
+    with open(PROFILE_CACHE_PATH, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def cached_part(key, fetch, edited=None):
+    """Return the cached value for key, calling fetch() only when it may have changed.
+
+    edited, if given, is one cheap call returning a last-edited stamp: the cached value
+    is reused while the stamp matches and it is younger than PROFILE_TTL. Without it,
+    the TTL alone decides. If the check or the fetch fails, the cached value is used.
+    """
+    with _profile_lock:
+        entry = _profile_cache.get(key)
+    now   = time.time()
+    stamp = edited() if edited else None
+    if entry and now - entry["fetched_at"] < PROFILE_TTL and stamp in (None, entry.get("stamp")):
+        print(f"  {key}: unchanged, using cached copy")
+        return entry["value"]
+    value = fetch()
+    if value is None:
+        return entry["value"] if entry else None
+    with _profile_lock:
+        _profile_cache[key] = {"value": value, "stamp": stamp, "fetched_at": now}
+    return value
+
+
+# --- TASTE PROFILE ---
+def _fetch_goodreads_books():
+    """Goodreads books rated 4 or 5 stars, as prompt lines, or None on failure."""
     try:
-        r = _scraper.get(GOODREADS_RSS, timeout=15)
+        r = transport.get(GOODREADS_RSS, cloudflare=True)
         r.raise_for_status()
         root = ET.fromstring(r.content)
         books = []
@@ -115,37 +250,46 @@ def load_taste_profile():
             if rating >= 4 and title:
                 label = "loved it" if rating == 5 else "liked it"
                 books.append(f"- {title} ({label})")
-        if books:
-            parts.append("Books the user has rated highly:\n" + "\n".join(books[:25]))
         print(f"  Goodreads: {len(books)} highly-rated books")
+        return books
     except Exception as e:
         print(f"  Goodreads: failed ({e})")
+        return None
+
+def _fetch_media_collection():
+    """Every entry in the Notion Media Collection (games, film, TV), as prompt lines, or None on failure."""
+    try:
+        url = f"https://api.notion.com/v1/databases/{MEDIA_COLLECTION_ID}/query"
+        entries = []
+        for page in _notion_results(url, query={}):
+            props = page.get("properties", {})
+            name  = "".join(t.get("plain_text", "") for t in props.get("Name", {}).get("title", []))
+            mtype = (props.get("Type", {}).get("select") or {}).get("name", "")
+            notes = "".join(t.get("plain_text", "") for t in props.get("Notes", {}).get("rich_text", []))
+            if name:
+                entry = f"- {name}" + (f" ({mtype})" if mtype else "") + (f": {notes}" if notes else "")
+                entries.append(entry)
+        print(f"  Notion collection: {len(entries)} entries")
+        return entries
+    except Exception as e:
+        print(f"  Notion media collection: failed ({e})")
+        return None
+
+@functools.cache
+def load_taste_profile():
+    parts = []
+
+    # Goodreads — books rated 4 or 5 stars
+    books = cached_part("goodreads", _fetch_goodreads_books)
+    if books:
+        parts.append("Books the user has rated highly:\n" + "\n".join(books[:25]))
 
     # Notion Media Collection — games, film, TV
     if NOTION_TOKEN:
-        try:
-            url = f"https://api.notion.com/v1/databases/{MEDIA_COLLECTION_ID}/query"
-            headers = {
-                "Authorization": f"Bearer {NOTION_TOKEN}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            }
-            r = requests.post(url, headers=headers, json={}, timeout=10)
-            r.raise_for_status()
-            entries = []
-            for page in r.json().get("results", []):
-                props = page.get("properties", {})
-                name  = "".join(t.get("plain_text", "") for t in props.get("Name", {}).get("title", []))
-                mtype = (props.get("Type", {}).get("select") or {}).get("name", "")
-                notes = "".join(t.get("plain_text", "") for t in props.get("Notes", {}).get("rich_text", []))
-                if name:
-                    entry = f"- {name}" + (f" ({mtype})" if mtype else "") + (f": {notes}" if notes else "")
-                    entries.append(entry)
-            if entries:
-                parts.append("Other media the user has loved (games, film, TV):\n" + "\n".join(entries))
-            print(f"  Notion collection: {len(entries)} entries")
-        except Exception as e:
-            print(f"  Notion media collection: failed ({e})")
+        entries = cached_part(f"notion_db:{MEDIA_COLLECTION_ID}", _fetch_media_collection,
+                              lambda: _notion_database_edited(MEDIA_COLLECTION_ID))
+        if entries:
+            parts.append("Other media the user has loved (games, film, TV):\n" + "\n".join(entries))
 
     if not parts:
         print("  No taste profile available — skipping filter")
@@ -153,7 +297,7 @@ def load_taste_profile():
 
     profile = "\n\n".join(parts)
 
-    rules = _fetch_notion_page_text(MEDIA_RECS_FILTER_ID)
+    rules = notion_page_text(MEDIA_RECS_FILTER_ID)
     if rules:
         print("  Loaded media recs filter rules from Notion")
     else:
@@ -168,235 +312,1054 @@ Here are the filter rules:
 {rules}"""
 
 
+def load_filter_context(feed):
+    """Resolve a feed's filter_prompt: NOTION and TASTE_PROFILE are loaded, anything else is the prompt itself."""
+    if feed.filter_prompt == "NOTION":
+        return load_notion_filter()
+    if feed.filter_prompt == "TASTE_PROFILE":
+        return load_taste_profile()
+    return feed.filter_prompt
+
+
 # --- ARCHIVE ---
 def archive_path(feed_name):
+    """Legacy JSON archive location; still written by --export-json and read once for migration."""
     return OUTPUT_DIR / f"{feed_name}_archive.json"
 
-def load_archive(feed_name):
+def migrate_archive(store, feed_name):
+    """Import output/<feed>_archive.json into the store the first time a feed is seen there."""
     path = archive_path(feed_name)
-    if not path.exists():
-        return []
+    if store.count(feed_name) or not path.exists():
+        return
     try:
         with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+            archive = json.load(f)
     except Exception as e:
         print(f"  Could not load archive: {e} — starting fresh")
-        return []
+        return
+    store.import_json(feed_name, archive)
+    print(f"  Migrated {len(archive)} articles from {path}")
 
-def save_archive(feed_name, archive):
-    with open(archive_path(feed_name), "w", encoding="utf-8") as f:
-        json.dump(archive, f, ensure_ascii=False, indent=2)
+def merge_into_archive(store, feed_name, new_articles, archive_days):
+    """Add new articles to the store and range-delete the ones older than archive_days,
+    sparing sealed archive pages that still hold a newer article."""
+    now = int(datetime.now(UTC).timestamp())
+    store.add(feed_name, new_articles, now)
+    cutoff = now - archive_days * 86400
+    pruned = store.prune(feed_name, cutoff, keep_pages=live_pages(store, feed_name, cutoff))
+    if pruned:
+        print(f"  Pruned {pruned} old articles")
+    store.commit()
 
-def merge_into_archive(archive, new_articles, archive_days):
-    existing_guids = {a["guid"] for a in archive}
-    now = datetime.now(UTC)
 
-    for a in new_articles:
-        if a["guid"] not in existing_guids:
-            a["added_at"] = now.isoformat()
-            archive.append(a)
-            existing_guids.add(a["guid"])
+# --- DEADLINE ---
+class DeadlineExceeded(Exception):
+    """A stage ran out of time. decisions holds whatever a cut-short batch did decide."""
 
-    cutoff = now.timestamp() - archive_days * 86400
-    archive = [
-        a for a in archive
-        if datetime.fromisoformat(a["added_at"]).timestamp() > cutoff
-    ]
-    archive.sort(key=lambda a: a["added_at"], reverse=True)
-    return archive
+    def __init__(self, message, decisions=None):
+        super().__init__(message)
+        self.decisions = decisions or {}
+
+def stage_deadlines(seconds):
+    """Return {stage: monotonic end time} for a run budget of `seconds`, or all None if unbounded."""
+    start = time.monotonic()
+    return {
+        stage: start + seconds * share if seconds else None
+        for stage, share in STAGE_SHARES.items()
+    }
+
+def remaining(deadline):
+    """Seconds left before deadline (None if unbounded), for use as a wait() timeout."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+# --- FETCH ---
+def fetch_source(source, known_guids=frozenset(), archived=frozenset(), archive_days=None):
+    """Fetch one source through its circuit breaker, recording the outcome in source health.
+
+    Sources that scrape article pages for images do it here, on the fetch worker, for
+    the articles that aren't archived and are within archive_days, so the page
+    fetches never hold up the thread consuming iter_fetch.
+    """
+    state = health.check(source.name)
+    if state == health.OPEN:
+        print(f"  {source.name}: breaker open, skipped")
+        return []
+    if state == health.PROBE:
+        print(f"  {source.name}: breaker open, probing")
+        with transport.single_attempt():
+            items = source.fetch(known_guids)
+    else:
+        items = source.fetch(known_guids)
+    health.record(source.name, source.last_error)
+    if hasattr(source, "enrich"):
+        fresh = [a for a in items if a.guid not in archived]
+        source.enrich(filter_by_pub_date(fresh, archive_days) if archive_days else fresh)
+    return items
+
+def iter_fetch(feeds, max_workers=FETCH_WORKERS, known_guids=None, archived=None, deadline=None):
+    """Fetch every source of every feed concurrently, yielding (feed, source index, articles)
+    as each fetch completes, so downstream stages can start on a feed before its other
+    sources (or other feeds) have returned.
+
+    known_guids maps feed name → GUIDs already handled (archived or decided), so
+    streaming sources can stop parsing once they reach articles we already have;
+    archived (same shape, defaulting to known_guids) decides which articles get their
+    images scraped. If the deadline passes first,
+    queued fetches are cancelled and iteration stops; sources that never came back
+    are simply never yielded.
+    """
+    known_guids = known_guids or {}
+    archived    = archived if archived is not None else known_guids
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {
+        pool.submit(fetch_source, source, known_guids.get(feed.name, frozenset()),
+                    archived.get(feed.name, frozenset()), feed.archive_days): (feed, i)
+        for feed in feeds
+        for i, source in enumerate(feed.sources)
+    }
+    outstanding = len(futures)
+    try:
+        for future in as_completed(futures, timeout=remaining(deadline)):
+            feed, i = futures[future]
+            try:
+                items = future.result()
+            except Exception as e:
+                print(f"  {feed.name} source {i + 1}: failed ({e})")
+                items = []
+            outstanding -= 1
+            yield feed, i, items
+    except TimeoutError:
+        print(f"  Fetch deadline reached with {outstanding} sources outstanding")
+    finally:
+        # Running fetches can't be interrupted, but nothing waits for them
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 # --- DATE FILTER ---
 def filter_by_pub_date(articles, archive_days):
-    """Drop articles with a pub_date older than archive_days. Articles with no date pass through."""
+    """Drop articles published more than archive_days ago. Articles with no date pass through."""
+    cutoff = int(datetime.now(UTC).timestamp()) - archive_days * 86400
+    return [a for a in articles if a.pub_ts is None or a.pub_ts >= cutoff]
+
+
+# --- DECISION LEDGER ---
+def ledger_path(feed_name):
+    return OUTPUT_DIR / f"{feed_name}_decisions.json"
+
+def load_ledger(feed_name):
+    """Return {guid: decision entry} for every article Claude has judged for this feed."""
+    path = ledger_path(feed_name)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  Could not load decision ledger: {e} — starting fresh")
+        return {}
+
+def save_ledger(feed_name, ledger):
+    with open(ledger_path(feed_name), "w", encoding="utf-8") as f:
+        json.dump(ledger, f, ensure_ascii=False, indent=2)
+
+def prune_ledger(ledger, archive_days):
+    """Drop decisions older than archive_days; by then the article has aged out of the date filter."""
     cutoff = datetime.now(UTC).timestamp() - archive_days * 86400
-    out = []
+    return {
+        guid: entry for guid, entry in ledger.items()
+        if datetime.fromisoformat(entry["decided_at"]).timestamp() > cutoff
+    }
+
+def prompt_hash(filter_context, classify_type=False):
+    """Identify the active filter prompt, so editing it invalidates earlier decisions."""
+    key = f"{classify_type}\n{filter_context}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+# --- CLAUDE FILTER ---
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for packing batches."""
+    return len(text) // 4 + 1
+
+def _article_line(n, a):
+    return f"{n}. [{a.source}] {a.title}" + (f" — {a.desc}" if a.desc else "")
+
+def pack_batches(articles, classify_type=False, screen=False):
+    """Split articles into batches sized by estimated tokens rather than a fixed count.
+
+    A batch closes when its expected reply would pass OUTPUT_FILL of MAX_OUTPUT_TOKENS
+    (so the JSON array isn't truncated) or its numbered article list would pass
+    MAX_INPUT_TOKENS. The filter context is sent once per request as a cached system
+    prompt, so however large the taste profile grows it doesn't shrink the batches.
+    Screening replies carry no reason, so screen batches hold many more articles.
+    Every batch holds at least one article.
+    """
+    if screen:
+        per_decision = TOKENS_PER_SCREEN
+    else:
+        per_decision = TOKENS_PER_DECISION + (TOKENS_PER_TYPE if classify_type else 0)
+    output_budget = int(MAX_OUTPUT_TOKENS * OUTPUT_FILL)
+
+    batches, batch, batch_tokens = [], [], 0
     for a in articles:
-        pd = a.get("pub_date", "")
-        if not pd:
-            out.append(a)
+        tokens = estimate_tokens(_article_line(len(batch) + 1, a))
+        if batch and (
+            (len(batch) + 1) * per_decision > output_budget
+            or batch_tokens + tokens > MAX_INPUT_TOKENS
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(a)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def parse_decisions(raw, count):
+    """Salvage every complete decision object from a reply, even a truncated or malformed one.
+
+    Returns {id: decision} for ids 1..count with an INCLUDE/EXCLUDE decision.
+    """
+    raw = re.sub(r"^```[a-z]*\n?", "", raw.strip())
+    raw = re.sub(r"\n?```$", "", raw)
+    decoder = json.JSONDecoder()
+    found   = {}
+    pos     = raw.find("{")
+    while pos != -1:
+        try:
+            d, end = decoder.raw_decode(raw, pos)
+        except ValueError:
+            pos = raw.find("{", pos + 1)
             continue
+        if (isinstance(d, dict) and isinstance(d.get("id"), int) and 1 <= d["id"] <= count
+                and d.get("decision") in ("INCLUDE", "EXCLUDE")):
+            found[d["id"]] = d
+        pos = raw.find("{", end)
+    return found
+
+def _system_prompt(filter_context, classify_type=False):
+    """The static part of every filter request, sent as a cacheable system prompt.
+
+    Only the numbered article list changes between batches, so repeat batches in a
+    run read this prefix from the prompt cache instead of paying for it again.
+    """
+    type_schema = ', "type": "Game|Film|Book|TV|Other"' if classify_type else ""
+    text = f"""You are filtering a feed for a personal digest.
+
+{filter_context}
+
+Evaluate each article the user sends. Return ONLY a JSON array with one object per article:
+[{{"id": 1, "decision": "INCLUDE", "reason": "one sentence reason"{type_schema}}}, ...]"""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+def _screen_prompt(filter_context):
+    """System prompt for the cheap first pass of a cascade: a decision and a confidence, no reason."""
+    text = f"""You are screening a feed for a personal digest.
+
+{filter_context}
+
+Evaluate each article the user sends. Return ONLY a JSON array with one object per article,
+where confidence is how sure you are of the decision, from 0 to 1:
+[{{"id": 1, "decision": "EXCLUDE", "confidence": 0.9}}, ...]"""
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+class Tier:
+    """One filter pass: the model, the system prompt it is sent, and its usage stats."""
+
+    def __init__(self, name, model, system):
+        self.name   = name
+        self.model  = model
+        self.system = system
+        self.stats  = UsageStats()
+
+def _request_decisions(batch, tier, client, deadline=None):
+    """Send one batch to Claude and return whatever decisions can be salvaged, keyed by 1-based id.
+
+    With a deadline, the request (retries included) is given only the time left before it.
+    """
+    numbered = "\n".join(_article_line(j + 1, a) for j, a in enumerate(batch))
+    bound    = {} if deadline is None else {"timeout": remaining(deadline)}
+    start    = time.monotonic()
+    response = client.messages.create(
+        model=tier.model,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        system=tier.system,
+        messages=[{"role": "user", "content": f"Articles:\n{numbered}"}],
+        **bound,
+    )
+    tier.stats.record(response, time.monotonic() - start)
+    found = parse_decisions(response.content[0].text, len(batch))
+    if not found:
+        raise ValueError("No decisions found in response")
+    return found
+
+def _classify_batch(batch, label, tier, client, deadline=None):
+    """Classify a batch, re-sending only the articles whose decisions are missing.
+
+    After two attempts, whatever is still undecided is split in half and each half is
+    retried the same way, down to single articles. API errors (as opposed to bad replies)
+    are not split, since smaller batches won't fix them. Returns {index in batch: decision}.
+
+    No request is sent once the deadline has passed: DeadlineExceeded is raised instead,
+    carrying the decisions made so far.
+    """
+    decided   = {}
+    remaining = list(range(len(batch)))
+    api_error = False
+    for attempt in range(2):
+        if expired(deadline):
+            raise DeadlineExceeded(f"batch {label} cut short with {len(remaining)} undecided", decided)
         try:
-            dt = parsedate_to_datetime(pd)
-            if dt.timestamp() >= cutoff:
-                out.append(a)
-        except Exception:
-            out.append(a)
-    return out
-
-
-# --- DEDUP ---
-def dedup_by_title(articles):
-    """Remove near-duplicates based on first 6 words of title (catches cross-source repeats)."""
-    seen = {}
-    out  = []
+            found = _request_decisions([batch[i] for i in remaining], tier, client, deadline)
+        except Exception as e:
+            print(f"  Batch {label} attempt {attempt + 1} failed: {e}")
+            api_error = isinstance(e, APIError)
+            continue
+        api_error = False
+        for local_id, d in found.items():
+            decided[remaining[local_id - 1]] = d
+        remaining = [i for i in remaining if i not in decided]
+        if not remaining:
+            return decided
+        print(f"  Batch {label} attempt {attempt + 1}: {len(remaining)} decisions missing")
+
+    if api_error:
+        # The API itself is failing; smaller batches won't help
+        print(f"  Batch {label}: giving up on {len(remaining)} articles")
+    elif len(remaining) == 1:
+        print(f"  Batch {label}: giving up on {batch[remaining[0]].title[:60]}")
+    elif remaining:
+        mid = len(remaining) // 2
+        for h, half in enumerate((remaining[:mid], remaining[mid:]), start=1):
+            try:
+                found = _classify_batch([batch[i] for i in half], f"{label}.{h}", tier, client, deadline)
+            except DeadlineExceeded as e:
+                decided.update((half[j], d) for j, d in e.decisions.items())
+                raise DeadlineExceeded(str(e), decided) from None
+            for j, d in found.items():
+                decided[half[j]] = d
+    return decided
+
+def split_decided(articles, ledger, prompt_key):
+    """Split articles into ({guid: ledger entry} decided under prompt_key, articles still to classify)."""
+    decided = {}
+    pending = []
     for a in articles:
-        key = " ".join(a["title"].lower().split()[:6])
-        if key not in seen:
-            seen[key] = True
-            out.append(a)
-    return out
+        entry = ledger.get(a.guid) if ledger is not None else None
+        if entry and entry.get("prompt") == prompt_key:
+            decided[a.guid] = entry
+        else:
+            pending.append(a)
+    return decided, pending
 
+def record_decisions(batch, decisions, prompt_key, classify_type, decided, ledger=None):
+    """Turn a batch's {index: decision} into ledger entries, stored in decided (and the ledger, if given).
 
-# --- CLAUDE FILTER ---
-def filter_articles(articles, filter_context, client, classify_type=False):
+    Entries keep the article's title, description and source so the prefilter can train on them.
+    """
+    now = datetime.now(UTC).isoformat()
+    for idx, d in sorted(decisions.items()):
+        a = batch[idx]
+        entry = {
+            "prompt":     prompt_key,
+            "decision":   d["decision"],
+            "reason":     d.get("reason", ""),
+            "decided_at": now,
+            "title":      a.title,
+            "desc":       a.desc,
+            "source":     a.source,
+        }
+        if classify_type:
+            entry["media_type"] = d.get("type", "")
+        decided[a.guid] = entry
+        if ledger is not None:
+            ledger[a.guid] = entry
+
+def apply_decisions(articles, decided, classify_type=False):
+    """Return the articles decided INCLUDE, in their original order, carrying the reason."""
     kept = []
-    type_schema = ', "type": "Game|Film|Book|TV|Other"' if classify_type else ""
-    for i in range(0, len(articles), BATCH_SIZE):
-        batch    = articles[i:i + BATCH_SIZE]
-        numbered = "\n".join(
-            f"{j+1}. [{a['source']}] {a['title']}" + (f" — {a['desc']}" if a["desc"] else "")
-            for j, a in enumerate(batch)
-        )
-        prompt = f"""You are filtering a feed for a personal digest.
+    for a in articles:
+        entry = decided.get(a.guid)
+        if entry and entry["decision"] == "INCLUDE":
+            article = replace(a, reason=entry.get("reason", ""))
+            if classify_type:
+                article.media_type = entry.get("media_type", "")
+            kept.append(article)
+            print(f"  + {a.title[:70]}")
+    return kept
 
-{filter_context}
+# --- STREAMING PASS ---
+class FeedRun:
+    """One feed's progress through the streaming pass.
+
+    Each source's articles go through the date filter, archive check and
+    near-duplicate check (against the persisted index and everything already let
+    through this run) as soon as its fetch returns. With dedup on, a source that
+    returns early waits for the ones listed before it, so the copy of a story that
+    survives is always the earliest source's. For filtered feeds, every full token-packed batch is
+    sent to the shared filter pool straight away, while other sources are still
+    fetching; the last, part-filled batch is flushed once every source is in. The
+    first batch sent runs alone when the prompt is cacheable, so the rest read it
+    from the prompt cache.
+
+    Feeds with a screen_model run a two-tier cascade: each batch is first screened
+    for a bare decision and confidence, and only its INCLUDEs and unsure EXCLUDEs go
+    on to filter_model for the reason and media type the RSS output shows.
 
-Evaluate each article below. Return ONLY a JSON array with one object per article:
-[{{"id": 1, "decision": "INCLUDE", "reason": "one sentence reason"{type_schema}}}, ...]
+    If the feed has a prefilter, articles the local model is confident about are
+    settled before batching and never reach Claude (in shadow mode they still do,
+    and the model's calls are compared with Claude's in shadow_agreement()).
 
-Articles:
-{numbered}"""
+    Decisions are applied in finish(), in source order, so output doesn't depend
+    on which source answered first. Workers stop sending requests at the filter
+    deadline; a batch cut short keeps the decisions it did get.
+    """
 
-        decisions = None
-        for attempt in range(2):
+    def __init__(self, feed, store, client=None, pool=None, prompt=None, deadline=None):
+        self.feed      = feed
+        self.store     = store
+        self.client    = client
+        self.pool      = pool
+        self.prompt    = prompt   # future resolving to the filter context
+        self.deadline  = deadline
+        self.context   = None
+        self.by_source = {}
+        self.arrived   = {}       # source index → articles waiting for earlier sources
+        self.dedup     = NearDupIndex(store, feed.name, feed.dedup_threshold) if feed.dedup_threshold else None
+        self.pending   = []
+        self.batches   = []       # [(batch, future)]
+        self.decided   = {}
+        self.hits      = 0
+        self.undecided = 0        # articles Claude gave up on or whose batch failed
+        self.imageless = set()    # indices of scraping sources whose page-image fetch came up empty
+        self.prefilter = None
+        self.local     = 0
+        self.shadow    = {}       # guid → prefilter decision, in shadow mode
+        self.warm      = None
+        self.classify  = feed.filter_prompt == "TASTE_PROFILE"
+        self.ledger    = load_ledger(feed.name) if feed.filter_prompt else None
+        self.tiers     = []       # [screen tier,] filter tier
+
+    @property
+    def fetched(self):
+        return len(self.by_source) == len(self.feed.sources)
+
+    @property
+    def futures(self):
+        return [f for _, f in self.batches]
+
+    def add(self, i, articles):
+        """Take source i's fetched articles through the pre-filter stages and queue them for Claude."""
+        feed     = self.feed
+        articles = filter_by_pub_date(articles, feed.archive_days)
+        archived = self.store.known_guids(feed.name, (a.guid for a in articles))
+        self.arrived[i] = [a for a in articles if a.guid not in archived]
+        if not self.dedup:
+            self._admit(i, self.arrived.pop(i))
+            return
+        # Dedup in source order: admit each source whose predecessors are all in
+        while len(self.by_source) in self.arrived:
+            n = len(self.by_source)
+            self._admit(n, self.dedup.filter(self.arrived.pop(n)))
+
+    def _admit(self, i, articles):
+        """Finish source i's pre-filter stages and queue its articles for Claude."""
+        feed = self.feed
+        if feed.require_image:
+            with_image = [a for a in articles if a.image]
+            if len(with_image) < len(articles) and getattr(feed.sources[i], "fetch_page_image", False):
+                self.imageless.add(i)
+            articles = with_image
+        self.by_source[i] = articles
+        if feed.filter_prompt:
+            self._queue(articles)
+
+    def _queue(self, articles):
+        if self.context is None:
+            self.context    = self.prompt.result() or ""
+            self.prompt_key = prompt_hash(self.context, self.classify)
+            self.tiers      = [Tier("filter", self.feed.filter_model, _system_prompt(self.context, self.classify))]
+            if self.feed.screen_model:
+                self.tiers.insert(0, Tier("screen", self.feed.screen_model, _screen_prompt(self.context)))
+            if self.feed.prefilter_confidence:
+                self.prefilter = train_from_ledger(self.ledger, self.prompt_key)
+        if not self.context:
+            return
+        hits, pending = split_decided(articles, self.ledger, self.prompt_key)
+        self.decided.update(hits)
+        self.hits    += len(hits)
+        if self.prefilter:
+            pending = self._prefilter(pending)
+        self.pending += pending
+        batches = pack_batches(self.pending, self.classify, screen=len(self.tiers) > 1)
+        if not self.fetched:
+            batches = batches[:-1]  # the last batch may still fill up from later sources
+        for batch in batches:
+            self._dispatch(batch)
+        self.pending = self.pending[sum(len(b) for b in batches):]
+
+    def _prefilter(self, articles):
+        """Settle the articles the local model is sure about and return the rest for Claude.
+
+        Media-typed feeds only settle EXCLUDEs, since an INCLUDE needs Claude's media type.
+        Local decisions stay out of the ledger so the model never trains on its own output.
+        """
+        now  = datetime.now(UTC).isoformat()
+        rest = []
+        for a in articles:
+            p        = self.prefilter.predict(a)
+            decision = "INCLUDE" if p >= 0.5 else "EXCLUDE"
+            sure     = max(p, 1 - p) >= self.feed.prefilter_confidence
+            if sure and decision == "INCLUDE" and self.classify:
+                sure = False
+            if sure and not self.feed.prefilter_shadow:
+                self.decided[a.guid] = {"prompt": self.prompt_key, "decision": decision, "reason": "", "decided_at": now}
+                self.local += 1
+                continue
+            if sure:
+                self.shadow[a.guid] = decision
+            rest.append(a)
+        return rest
+
+    def shadow_agreement(self):
+        """(predictions Claude has since decided, how many of those it agreed with)."""
+        checked = [g for g in self.shadow if g in self.decided]
+        return len(checked), sum(self.shadow[g] == self.decided[g]["decision"] for g in checked)
+
+    def _dispatch(self, batch):
+        label = f"{self.feed.name}/{len(self.batches) + 1}"
+        if not self.batches and estimate_tokens(self.tiers[0].system[0]["text"]) >= MIN_CACHE_TOKENS:
+            future = self.pool.submit(self._classify, batch, label)
+            self.warm = future
+        else:
+            future = self.pool.submit(self._classify, batch, label, self.warm)
+        self.batches.append((batch, future))
+
+    def _classify(self, batch, label, warm=None):
+        """Worker: classify one batch, once the warm-up batch (if any) has written the prompt cache.
+
+        In a cascade, confident screen EXCLUDEs stand (with no reason); everything else,
+        including articles the screen failed to decide, is re-packed for the filter tier.
+        """
+        if warm is not None:
+            wait([warm], timeout=remaining(self.deadline))
+        if len(self.tiers) == 1:
+            return _classify_batch(batch, label, self.tiers[0], self.client, self.deadline)
+        screen, tier = self.tiers
+        decided = {}
+        try:
+            screened = _classify_batch(batch, f"{label}s", screen, self.client, self.deadline)
+        except DeadlineExceeded as e:
+            screened = e.decisions  # the rest escalates, and the filter tier stops straight away
+        for i, d in screened.items():
+            try:
+                confidence = float(d.get("confidence", 0))
+            except (TypeError, ValueError):
+                confidence = 0.0
+            if d["decision"] == "EXCLUDE" and confidence >= self.feed.screen_confidence:
+                decided[i] = {"decision": "EXCLUDE", "reason": ""}
+        escalate = [i for i in range(len(batch)) if i not in decided]
+        offset   = 0
+        for n, part in enumerate(pack_batches([batch[i] for i in escalate], self.classify), start=1):
+            try:
+                found = _classify_batch(part, f"{label}.{n}", tier, self.client, self.deadline)
+            except DeadlineExceeded as e:
+                decided.update((escalate[offset + j], d) for j, d in e.decisions.items())
+                raise DeadlineExceeded(str(e), decided) from None
+            for j, d in found.items():
+                decided[escalate[offset + j]] = d
+            offset += len(part)
+        return decided
+
+    def collect(self):
+        """Record the decisions of every finished batch in the ledger. Returns how many are unfinished,
+        counting batches the deadline cut short (their decisions are still recorded).
+
+        Articles of finished batches that got no decision are counted in undecided.
+        """
+        unfinished     = 0
+        self.undecided = 0
+        for batch, future in self.batches:
+            if not future.done() or future.cancelled():
+                unfinished += 1
+                continue
             try:
-                response = client.messages.create(
-                    model="claude-haiku-4-5-20251001",
-                    max_tokens=2048,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                raw = response.content[0].text.strip()
-                raw = re.sub(r"^```[a-z]*\n?", "", raw)
-                raw = re.sub(r"\n?```$", "", raw)
-                match = re.search(r"\[.*\]", raw, re.DOTALL)
-                if not match:
-                    raise ValueError("No JSON array found in response")
-                decisions = json.loads(match.group(0))
-                break
+                decisions = future.result()
+            except DeadlineExceeded as e:
+                print(f"  Deadline reached: {e}")
+                decisions   = e.decisions
+                unfinished += 1
             except Exception as e:
-                print(f"  Batch {i // BATCH_SIZE + 1} attempt {attempt + 1} failed: {e}")
-
-        if decisions:
-            for d in decisions:
-                idx = d["id"] - 1
-                if 0 <= idx < len(batch) and d["decision"] == "INCLUDE":
-                    article = batch[idx].copy()
-                    article["reason"] = d.get("reason", "")
-                    if classify_type:
-                        article["media_type"] = d.get("type", "")
-                    kept.append(article)
-                    print(f"  + {batch[idx]['title'][:70]}")
+                print(f"  Batch failed: {e}")
+                self.undecided += len(batch)
+                continue
+            self.undecided += len(batch) - len(decisions)
+            record_decisions(batch, decisions, self.prompt_key, self.classify, self.decided, self.ledger)
+        return unfinished
 
-    return kept
+    def finish(self):
+        """Return the kept articles, in source order.
+
+        Raises DeadlineExceeded if a batch is still outstanding; the decisions that
+        did come back are in the ledger either way.
+        """
+        articles = [a for i in range(len(self.feed.sources)) for a in self.by_source[i]]
+        if not self.feed.filter_prompt:
+            return articles
+        if not self.context:
+            return []
+        unfinished = self.collect()
+        if unfinished:
+            raise DeadlineExceeded(f"{unfinished} of {len(self.batches)} batches unfinished")
+        return apply_decisions(articles, self.decided, self.classify)
+
+
+# --- INTERLEAVE ---
+def assign_slots(archives, weights, now, step=SLOT_SECONDS):
+    """Give every article without a slot_ts one, interleaving feeds by weight.
+
+    archives maps feed name → articles newest first. New articles are merged across
+    feeds with a heap keyed on each feed's virtual time (articles taken / weight), so
+    a feed of weight 2 gets two slots for every one of a weight-1 feed, and equal
+    weights reduce to a plain round-robin in feed order. Slots count back from now
+    in steps of `step` seconds, shortened if needed so every new slot is still newer
+    than the newest existing one. If even one-second steps don't fit (a rerun moments
+    after the last one), the slots start from the newest existing one + 1 instead,
+    so the newest of them may lie a few seconds past now. Articles that already have
+    a slot keep it, so their pubDate never changes between runs.
+
+    Returns {feed name: {guid: slot_ts}} for the articles given a slot this time.
+    """
+    new    = {name: [a for a in articles if a.slot_ts is None] for name, articles in archives.items()}
+    count  = sum(map(len, new.values()))
+    newest = max((a.slot_ts for articles in archives.values() for a in articles if a.slot_ts is not None), default=None)
+    top    = now
+    if newest is not None:
+        step = max(1, min(step, (now - newest) // (count + 1)))
+        top  = max(now, newest + count * step)  # oldest new slot: top - (count - 1) * step > newest
+    heap   = [(0.0, order, name) for order, name in enumerate(new) if new[name]]
+    heapq.heapify(heap)
+    taken    = dict.fromkeys(new, 0)
+    assigned = {name: {} for name in new}
+    slot     = 0
+    while heap:
+        vtime, order, name = heapq.heappop(heap)
+        article = new[name][taken[name]]
+        article.slot_ts = top - slot * step
+        assigned[name][article.guid] = article.slot_ts
+        slot        += 1
+        taken[name] += 1
+        if taken[name] < len(new[name]):
+            heapq.heappush(heap, (vtime + 1 / weights.get(name, 1.0), order, name))
+    return assigned
 
 
 # --- RSS OUTPUT ---
-def build_rss(feed, articles, timestamp_map=None):
-    rss     = ET.Element("rss", version="2.0")
-    channel = ET.SubElement(rss, "channel")
-    ET.SubElement(channel, "title").text        = feed.title
-    ET.SubElement(channel, "link").text         = "https://justinlycklama.github.io/rss-digest/"
-    ET.SubElement(channel, "description").text  = feed.description
-    ET.SubElement(channel, "lastBuildDate").text = datetime.now(UTC).strftime("%a, %d %b %Y %H:%M:%S +0000")
+def _item_title(a):
+    return f"{a.media_type}: {a.title}" if a.media_type and a.media_type != "Other" else a.title
+
+def _item_html(a):
+    footer = f"{a.source} — {a.reason}" if a.reason else a.source
+    return f"<p>{a.desc}</p><p><em>{footer}</em></p>"
+
+def _rss_item(a):
+    parts = [
+        "<item>",
+        f"<title>{escape(_item_title(a))}</title>",
+        f"<link>{escape(a.link)}</link>",
+        f"<description>{escape(_item_html(a))}</description>",
+        f'<guid isPermaLink="false">{escape(a.guid)}</guid>',
+    ]
+    if a.slot_ts is not None:
+        parts.append(f"<pubDate>{rfc822(a.slot_ts)}</pubDate>")
+    if a.image:
+        parts.append(f'<media:content url={quoteattr(a.image)} medium="image" />')
+    parts.append("</item>")
+    return "".join(parts)
 
+def rss_chunks(feed, articles, links=(), archive=False):
+    """Yield an RSS document as strings, one item at a time, without building a tree.
+
+    links are (rel, file name) pairs written as atom:link elements; archive marks the
+    document as an RFC 5005 archive page. lastBuildDate is the newest pubDate slot
+    rather than the wall clock, so a feed with no new articles renders to exactly
+    the same bytes as last run.
+    """
+    yield "<?xml version='1.0' encoding='utf-8'?>\n"
+    yield f'<rss xmlns:media="{MEDIA_NS}" xmlns:atom="{ATOM_NS}" xmlns:fh="{FH_NS}" version="2.0"><channel>'
+    yield f"<title>{escape(feed.title)}</title>"
+    yield f"<link>{SITE_URL}</link>"
+    yield f"<description>{escape(feed.description)}</description>"
+    for rel, name in links:
+        yield f'<atom:link rel="{rel}" href={quoteattr(SITE_URL + name)} />'
+    if archive:
+        yield "<fh:archive />"
+    slots = [a.slot_ts for a in articles if a.slot_ts is not None]
+    if slots:
+        yield f"<lastBuildDate>{rfc822(max(slots))}</lastBuildDate>"
     for a in articles:
-        item = ET.SubElement(channel, "item")
-        media_type = a.get("media_type", "")
-        title = f"{media_type}: {a['title']}" if media_type and media_type != "Other" else a["title"]
-        ET.SubElement(item, "title").text = title
-        ET.SubElement(item, "link").text  = a["link"]
-
-        reason = a.get("reason", "")
-        source = a.get("source", "")
-        desc   = a.get("desc", "")
-        footer = f"{source} — {reason}" if reason else source
-        ET.SubElement(item, "description").text = f"<p>{desc}</p><p><em>{footer}</em></p>"
-
-        guid_el      = ET.SubElement(item, "guid")
-        guid_el.text = a["guid"]
-        guid_el.set("isPermaLink", "false")
-
-        if timestamp_map and a["guid"] in timestamp_map:
-            ET.SubElement(item, "pubDate").text = timestamp_map[a["guid"]]
-
-        if a.get("image"):
-            mc = ET.SubElement(item, f"{{{MEDIA_NS}}}content")
-            mc.set("url", a["image"])
-            mc.set("medium", "image")
+        yield _rss_item(a)
+    yield "</channel></rss>"
+
+def build_rss(feed, articles, store=None):
+    """Write <name>.xml and return the articles in it.
 
+    Feeds with current_items get the RFC 5005 layout (see page_archive), which
+    records page numbers in store.
+    """
+    current, links = articles, ()
+    if feed.current_items:
+        current, links = write_archive_pages(feed, articles, store)
     out_path = OUTPUT_DIR / f"{feed.name}.xml"
-    ET.ElementTree(rss).write(str(out_path), encoding="utf-8", xml_declaration=True)
-    print(f"  Wrote {len(articles)} articles to {out_path}")
+    data     = (chunk.encode("utf-8") for chunk in rss_chunks(feed, current, links))
+    if write_if_changed(out_path, data):
+        print(f"  Wrote {len(current)} articles to {out_path}")
+    else:
+        print(f"  {out_path} unchanged")
+    return current
+
+
+# --- JSON FEED ---
+def json_feed(feed, articles):
+    """Build a JSON Feed 1.1 document from the same articles and fields as the RSS output."""
+    items = []
+    for a in articles:
+        item = {
+            "id":           a.guid,
+            "url":          a.link,
+            "title":        _item_title(a),
+            "content_html": _item_html(a),
+            "summary":      a.desc,
+            "authors":      [{"name": a.source}],
+        }
+        if a.image:
+            item["image"] = a.image
+        if a.slot_ts is not None:
+            item["date_published"] = datetime.fromtimestamp(a.slot_ts, UTC).isoformat()
+        if a.media_type:
+            item["tags"] = [a.media_type]
+        items.append(item)
+    return {
+        "version":       "https://jsonfeed.org/version/1.1",
+        "title":         feed.title,
+        "home_page_url": SITE_URL,
+        "feed_url":      f"{SITE_URL}{feed.name}.json",
+        "description":   feed.description,
+        "items":         items,
+    }
+
+def build_json(feed, articles):
+    """Write <name>.json alongside <name>.xml, holding the same articles."""
+    out_path = OUTPUT_DIR / f"{feed.name}.json"
+    data     = json.dumps(json_feed(feed, articles), ensure_ascii=False, indent=2).encode("utf-8")
+    if write_if_changed(out_path, data):
+        print(f"  Wrote {len(articles)} articles to {out_path}")
+
+
+# --- COMBINED FEED ---
+def merge_archives(archives, limit=ALL_MAX_ITEMS):
+    """k-way merge of every feed's articles by pubDate slot, newest first, keeping the first `limit`."""
+    by_slot = lambda a: -(a.slot_ts or 0)
+    streams = [sorted(articles, key=by_slot) for articles in archives]
+    return list(itertools.islice(heapq.merge(*streams, key=by_slot), limit))
+
+def build_combined(archives):
+    """Write all.xml and all.json: the newest ALL_MAX_ITEMS articles across every feed."""
+    merged = merge_archives(archives)
+    build_rss(ALL_FEED, merged)
+    build_json(ALL_FEED, merged)
+
+
+# --- ARCHIVE PAGES ---
+# RFC 5005 archived feeds: <name>.xml carries the newest current_items articles and a
+# prev-archive link to the newest archive page, <name>-archive-<n>.xml. Each page
+# links back to the one before it. Articles leave the current document oldest
+# first into the open (newest) page, which is sealed once it holds
+# ARCHIVE_PAGE_SIZE; sealed pages are written once and never change after that,
+# except that when the oldest page expires the next one is rewritten once to drop
+# its prev-archive link to the deleted page.
+# Each article's page number is kept in archive.db (articles.page). Pruning spares a
+# sealed page until all its articles are older than archive_days and then removes it
+# whole; articles on the open page are pruned one by one like the rest of the archive.
+def page_name(feed_name, n):
+    return f"{feed_name}-archive-{n}.xml"
+
+def migrate_pages(store, feed_name):
+    """Move page numbers from the old output/<feed>_pages.json manifest into the store, once."""
+    path = OUTPUT_DIR / f"{feed_name}_pages.json"
+    if not path.exists():
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"  Could not load archive pages: {e} — starting fresh")
+        manifest = []
+    store.set_pages(feed_name, {d["guid"]: page["n"] for page in manifest for d in page["items"]})
+    store.set_last_page(feed_name, max([store.last_page(feed_name), *(page["n"] for page in manifest)]))
+    store.commit()
+    path.unlink()
+    print(f"  Migrated archive pages from {path}")
+
+def pages_on_disk(feed_name):
+    """Numbers of the feed's archive page files currently in OUTPUT_DIR."""
+    pattern = re.compile(rf"{re.escape(feed_name)}-archive-(\d+)\.xml")
+    numbers = set()
+    for path in OUTPUT_DIR.glob(f"{feed_name}-archive-*.xml"):
+        m = pattern.fullmatch(path.name)
+        if m:
+            numbers.add(int(m.group(1)))
+    return numbers
+
+def is_sealed(n, size, last):
+    """Every page but the newest is sealed; the newest once it is full."""
+    return n != last or size >= ARCHIVE_PAGE_SIZE
+
+def live_pages(store, feed_name, cutoff):
+    """Sealed pages with an article newer than cutoff, which pruning must spare whole."""
+    sizes = store.page_sizes(feed_name)
+    last  = max(sizes, default=None)
+    return [n for n, (size, newest) in sizes.items() if is_sealed(n, size, last) and newest > cutoff]
+
+def page_archive(feed, articles, last=0):
+    """Move the unpaged articles past the newest feed.current_items onto archive pages, oldest first.
+
+    Sets page on each article moved and returns {guid: page number} for them. An
+    article's pubDate slot never changes, so it is paged exactly once. New pages are
+    numbered past last (the highest number ever given out), so an expired page's URL
+    is never reused for other articles.
+    """
+    sizes = {}
+    for a in articles:
+        if a.page is not None:
+            sizes[a.page] = sizes.get(a.page, 0) + 1
+    last    = max([last, *sizes])
+    open_n  = last if 0 < sizes.get(last, 0) < ARCHIVE_PAGE_SIZE else None
+    unpaged = sorted((a for a in articles if a.page is None), key=lambda a: a.slot_ts or 0, reverse=True)
+    moved   = {}
+    for a in reversed(unpaged[feed.current_items:]):
+        if open_n is None:
+            last  += 1
+            open_n = last
+        a.page = open_n
+        moved[a.guid] = open_n
+        sizes[open_n] = sizes.get(open_n, 0) + 1
+        if sizes[open_n] >= ARCHIVE_PAGE_SIZE:
+            open_n = None
+    return moved
+
+def write_archive_pages(feed, articles, store):
+    """Page the feed's archive and update the page files on disk. Returns (current articles, links for <name>.xml)."""
+    last  = max([store.last_page(feed.name), *pages_on_disk(feed.name)])
+    moved = page_archive(feed, articles, last)
+    store.set_pages(feed.name, moved)
+    store.set_last_page(feed.name, max([last, *moved.values()]))
+    store.commit()
+
+    pages = {}
+    for a in sorted(articles, key=lambda a: a.slot_ts or 0, reverse=True):
+        pages.setdefault(a.page, []).append(a)
+    current = pages.pop(None, [])
+    numbers = sorted(pages)
+    removed = sorted(pages_on_disk(feed.name) - set(numbers))
+    for n in removed:
+        path = OUTPUT_DIR / page_name(feed.name, n)
+        for p in [path, *variants(path)]:
+            p.unlink(missing_ok=True)
+        print(f"  Removed expired archive page {path}")
+
+    changed = set(moved.values())
+    relink  = bool(numbers and removed) and removed[0] < numbers[0]
+    for k, n in enumerate(numbers):
+        path = OUTPUT_DIR / page_name(feed.name, n)
+        # Sealed pages are final: only written the run they fill up (or if lost), or
+        # when they become the first page and lose their prev-archive link
+        if (is_sealed(n, len(pages[n]), numbers[-1]) and n not in changed and path.exists()
+                and not (relink and k == 0)):
+            continue
+        links = [("current", f"{feed.name}.xml")]
+        if k:
+            links.append(("prev-archive", page_name(feed.name, numbers[k - 1])))
+        data = (chunk.encode("utf-8") for chunk in rss_chunks(feed, pages[n], links, archive=True))
+        if write_if_changed(path, data):
+            print(f"  Wrote {len(pages[n])} articles to {path}")
+
+    links = [("current", f"{feed.name}.xml")]
+    if numbers:
+        links.append(("prev-archive", page_name(feed.name, numbers[-1])))
+    return current, links
 
 
 # --- MAIN ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--feeds", help="Comma-separated feed names to run (default: all)")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS,
+                        help=f"Max sources fetched at once (default: {FETCH_WORKERS})")
+    parser.add_argument("--filter-workers", type=int, default=FILTER_WORKERS,
+                        help=f"Max Claude batches in flight across all feeds (default: {FILTER_WORKERS})")
+    parser.add_argument("--export-json", action="store_true",
+                        help="Also write each archive to output/<name>_archive.json (legacy layout)")
+    parser.add_argument("--deadline", type=float,
+                        help="Overall run budget in seconds, split across fetch/filter/write; "
+                             "feeds that don't finish keep their previous archive and output")
     args = parser.parse_args()
+    deadlines = stage_deadlines(args.deadline)
     selected = set(args.feeds.split(",")) if args.feeds else None
     feeds_to_run = [f for f in FEEDS if selected is None or f.name in selected]
 
     OUTPUT_DIR.mkdir(exist_ok=True)
-    client = Anthropic() if any(f.filter_prompt for f in feeds_to_run) else None
+    store  = ArticleStore(ARCHIVE_DB)
+    # One client for the whole run, so every feed draws from the same rate limit
+    client = RateLimitedClient() if any(f.filter_prompt for f in feeds_to_run) else None
+
+    # Pass 1: fetch every source at once and stream each one's articles through
+    # the date filter, archive check and near-duplicate check as it returns, sending Claude batches
+    # from one shared pool while the remaining sources are still fetching.
+    # Sources send conditional GETs; a 304 comes back as "no new items".
+    http_cache.load(HTTP_CACHE_PATH)
+    transport.load_sessions(CF_SESSION_PATH)
+    health.load(HEALTH_PATH)
+    load_profile_cache()
+    print("\n=== fetch ===")
+    for feed in feeds_to_run:
+        migrate_archive(store, feed.name)
+        migrate_pages(store, feed.name)
+    archived    = {feed.name: store.guids(feed.name) for feed in feeds_to_run}
+    filter_pool = ThreadPoolExecutor(max_workers=args.filter_workers)
+    runs = {
+        feed.name: FeedRun(
+            feed, store, client, filter_pool,
+            filter_pool.submit(load_filter_context, feed) if feed.filter_prompt else None,
+            deadlines["filter"],
+        )
+        for feed in feeds_to_run
+    }
+    # Chronological sources stop parsing at a run of GUIDs we've already handled: archived
+    # ones, and on filtered feeds also the ledger's, since most decisions are EXCLUDEs
+    # that never reach the archive
+    known = {name: guids | set(runs[name].ledger or ()) for name, guids in archived.items()}
+    try:
+        for feed, i, items in iter_fetch(feeds_to_run, max_workers=args.fetch_workers, known_guids=known,
+                                         archived=archived, deadline=deadlines["fetch"]):
+            runs[feed.name].add(i, items)
+        wait([f for run in runs.values() for f in run.futures], timeout=remaining(deadlines["filter"]))
+    finally:
+        filter_pool.shutdown(wait=False, cancel_futures=True)
 
-    # Pass 1: fetch, filter, update archives
     all_archives = {}
+    unfinished   = []
+    refetch      = []  # finished feeds with articles Claude never decided
     for feed in feeds_to_run:
+        run = runs[feed.name]
         print(f"\n=== {feed.name} ===")
 
-        archive        = load_archive(feed.name)
-        archive_guids  = {a["guid"] for a in archive}
-        print(f"  Archive: {len(archive)} articles")
-
-        articles = []
-        for source in feed.sources:
-            articles.extend(source.fetch())
+        print(f"  Archive: {store.count(feed.name)} articles")
+        if not run.fetched:
+            print("  Fetch did not finish — keeping previous archive")
+            if run.ledger is not None:
+                run.collect()
+                save_ledger(feed.name, prune_ledger(run.ledger, feed.archive_days))
+            all_archives[feed.name] = store.load(feed.name)
+            unfinished.append(feed)
+            continue
 
-        articles     = filter_by_pub_date(articles, feed.archive_days)
-        articles     = dedup_by_title(articles)
-        if feed.require_image:
-            articles = [a for a in articles if a.get("image")]
-        new_articles = [a for a in articles if a["guid"] not in archive_guids]
+        new_articles = [a for i in range(len(feed.sources)) for a in run.by_source[i]]
         print(f"  {len(new_articles)} new articles")
+        if run.dedup and run.dedup.dropped:
+            print(f"  {run.dedup.dropped} near-duplicates dropped")
 
         if feed.filter_prompt:
-            if feed.filter_prompt == "NOTION":
-                prompt = load_notion_filter()
-            elif feed.filter_prompt == "TASTE_PROFILE":
-                prompt = load_taste_profile()
-            else:
-                prompt = feed.filter_prompt
-
-            if prompt:
-                classify = feed.filter_prompt == "TASTE_PROFILE"
-                kept = filter_articles(new_articles, prompt, client, classify_type=classify)
-                print(f"  Kept: {len(kept)}")
-            else:
-                kept = []
+            print(f"  Ledger: {run.hits} already decided, {sum(len(b) for b, _ in run.batches)} classified")
+            if run.local:
+                print(f"  Prefilter: {run.local} settled locally")
+            try:
+                kept = run.finish()
+            except DeadlineExceeded as e:
+                print(f"  Filter deadline reached ({e}) — keeping previous archive")
+                all_archives[feed.name] = store.load(feed.name)
+                unfinished.append(feed)
+                continue
+            finally:
+                save_ledger(feed.name, prune_ledger(run.ledger, feed.archive_days))
+                for tier in run.tiers:
+                    if tier.stats.requests:
+                        label = f" {tier.name} ({tier.model})" if len(run.tiers) > 1 else ""
+                        print(f"  Claude{label}: {tier.stats}")
+                if run.shadow:
+                    checked, agreed = run.shadow_agreement()
+                    print(f"  Prefilter (shadow): {len(run.shadow)} would have been settled locally, "
+                          f"{agreed}/{checked} agree with Claude")
+            print(f"  Kept: {len(kept)}")
+            if run.undecided:
+                print(f"  {run.undecided} articles undecided — sources will be fetched in full next run")
+                refetch.append(feed)
         else:
-            kept = new_articles
-
-        archive = merge_into_archive(archive, kept, feed.archive_days)
-        save_archive(feed.name, archive)
-        all_archives[feed.name] = archive
-
-    # Pass 2: assign jitter timestamps by round-robining across all feeds,
-    # then write RSS. This interleaves feeds evenly regardless of archive size.
-    now = datetime.now(UTC)
-    timestamp_map = {}
-    queues = [list(all_archives[feed.name]) for feed in feeds_to_run]
-    slot = 0
-    while any(queues):
-        for queue in queues:
-            if queue:
-                article = queue.pop(0)
-                ts = now - timedelta(minutes=slot * 10)
-                timestamp_map[article["guid"]] = ts.strftime("%a, %d %b %Y %H:%M:%S +0000")
-                slot += 1
+            kept = run.finish()
 
-    for feed in feeds_to_run:
-        build_rss(feed, all_archives[feed.name], timestamp_map)
+        if run.dedup:
+            run.dedup.save()
+        merge_into_archive(store, feed.name, kept, feed.archive_days)
+        all_archives[feed.name] = store.load(feed.name)
+        if args.export_json:
+            store.export_json(feed.name, archive_path(feed.name))
+
+    # Pass 2: give new articles a pubDate slot, interleaving feeds by weight. Articles
+    # from earlier runs keep theirs, so readers don't see every item as changed daily.
+    now = int(datetime.now(UTC).timestamp())
+    assigned = assign_slots({feed.name: all_archives[feed.name] for feed in feeds_to_run},
+                            {feed.name: feed.weight for feed in feeds_to_run}, now)
+    for name, slots in assigned.items():
+        store.set_slots(name, slots)
+    store.commit()
+
+    # Only persist validators once every archive is saved, so a crashed run
+    # re-downloads instead of treating unprocessed items as already seen. The same
+    # goes for feeds that ran out of time or left articles undecided: they are in
+    # neither the ledger nor the archive, so their sources must be fetched in full next run.
+    # Likewise for sources whose page-image scrape failed on a require_image feed, so the
+    # dropped articles get another try.
+    retry = [s for f in [*unfinished, *refetch] for s in f.sources]
+    retry += [f.sources[i] for f in feeds_to_run for i in runs[f.name].imageless]
+    http_cache.save(HTTP_CACHE_PATH, skip={getattr(s, "url", None) for s in retry})
+    transport.save_sessions(CF_SESSION_PATH)
+    health.save(HEALTH_PATH)
+    save_profile_cache()
+
+    for i, feed in enumerate(feeds_to_run):
+        if expired(deadlines["write"]):
+            print(f"\nWrite deadline reached — keeping previous output for {', '.join(f.name for f in feeds_to_run[i:])}")
+            break
+        current = build_rss(feed, all_archives[feed.name], store)
+        build_json(feed, current)
+    else:
+        # Only once every feed is written; a --feeds run would leave the rest out
+        if selected is None:
+            build_combined([all_archives[feed.name] for feed in feeds_to_run])
+    store.close()
+
+    # Everything a reader can fetch: feeds, archive pages, JSON feeds and all.*
+    published = [*OUTPUT_DIR.glob("*.xml"), *(OUTPUT_DIR / f"{f.name}.json" for f in [*FEEDS, ALL_FEED])]
+    write_build_marker(BUILD_MARKER_PATH, [p for p in published if p.exists()])
+
+    breakers = health.open_breakers()
+    if breakers:
+        print("\nOpen breakers:")
+        for name, entry in breakers:
+            next_attempt = datetime.fromtimestamp(entry["next_attempt"], UTC).strftime("%Y-%m-%d %H:%M")
+            print(f"  {name}: {entry['failures']} failures, next probe {next_attempt} UTC ({entry.get('last_error', '')})")
+
+    if unfinished:
+        print(f"\nUnfinished feeds (previous archive kept): {', '.join(f.name for f in unfinished)}")
 
     print("\nDone.")
+    if args.deadline:
+        # A fetch or Claude call still running past its stage deadline would hold the
+        # process open (pool threads are joined at exit) and delay the deploy step.
+        # Everything is saved by now, and their results are no longer wanted.
+        sys.stdout.flush()
+        os._exit(0)
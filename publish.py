@@ -0,0 +1,110 @@
+"""
+publish.py — Write output files only when their content changes
+
+write_if_changed() streams the new content to a temp file while hashing it,
+compares the SHA-256 with the file already on disk and leaves an identical file
+untouched (same bytes, same mtime). A file that did change is replaced atomically
+and gets precompressed siblings next to it, so a static host or serve.py can hand
+them out without compressing per request:
+
+  <name>.gz   gzip, level 9, mtime 0 so identical content compresses identically
+  <name>.br   brotli, quality 11 — only if the optional brotli package is installed
+
+write_build_marker() is called once a run has finished writing; serve.py watches
+it to know when to swap in the new set of files.
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+from datetime import datetime, UTC
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 65536
+
+
+def file_hash(path):
+    """SHA-256 hex digest of a file's bytes, or None if it doesn't exist."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def _replace(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def variants(path):
+    """The precompressed sibling paths of path that this install can produce."""
+    path = Path(path)
+    out  = [path.with_name(path.name + ".gz")]
+    if brotli is not None:
+        out.append(path.with_name(path.name + ".br"))
+    return out
+
+
+def _compress(path, variant):
+    """Write variant as the gzip or brotli compression of path, reading it from disk in chunks."""
+    tmp = variant.with_name(variant.name + ".tmp")
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        if variant.suffix == ".gz":
+            with gzip.GzipFile(filename="", mode="wb", fileobj=dst, compresslevel=9, mtime=0) as gz:
+                shutil.copyfileobj(src, gz, CHUNK_SIZE)
+        else:
+            compressor = brotli.Compressor(quality=11)
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+    os.replace(tmp, variant)
+
+
+def write_if_changed(path, data):
+    """Write data (bytes, or an iterable of bytes chunks) to path plus its .gz / .br siblings,
+    unless path already holds it.
+
+    Chunks go straight to a temp file while their hash is computed, so the document
+    is never held in memory whole; the temp file replaces path only if the hash
+    differs. Missing siblings of an unchanged file are still filled in. Returns
+    True if path was written.
+    """
+    path   = Path(path)
+    chunks = [data] if isinstance(data, bytes) else data
+    tmp    = path.with_name(path.name + ".tmp")
+    digest = hashlib.sha256()
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            digest.update(chunk)
+            f.write(chunk)
+    changed = file_hash(path) != digest.hexdigest()
+    if changed:
+        os.replace(tmp, path)
+        if brotli is None:
+            # Don't leave a .br from an install that had brotli describing old content
+            path.with_name(path.name + ".br").unlink(missing_ok=True)
+    else:
+        tmp.unlink()
+    for variant in variants(path):
+        if changed or not variant.exists():
+            _compress(path, variant)
+    return changed
+
+
+def write_build_marker(path, files):
+    """Atomically record that a build finished, listing the published files (names relative to path's directory)."""
+    path   = Path(path)
+    marker = {"built_at": datetime.now(UTC).isoformat(), "files": sorted(Path(f).name for f in files)}
+    _replace(path, json.dumps(marker, indent=2).encode("utf-8"))
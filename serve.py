@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+serve.py — Serve the pipeline's output from memory
+
+    python serve.py [--port 8000] [--dir output]
+
+Every file listed in output/build.json (written by pipeline.py at the end of a
+run) is read into memory once, together with its .gz / .br siblings, and given a
+strong ETag from its SHA-256. Requests never touch the disk:
+  - If-None-Match matching the current ETag gets 304 Not Modified
+  - Accept-Encoding picks br, then gzip, from the precompressed variants; each
+    encoding has its own ETag, and responses carry Vary: Accept-Encoding
+  - a watcher polls build.json, loads the new build in the background and swaps
+    it in with one assignment, so a request sees either the old build or the new
+    one, never a mix
+
+Try it with a plain HTTP client:
+
+    curl -i localhost:8000/news.xml
+    curl -i -H 'If-None-Match: "<etag from above>"' localhost:8000/news.xml
+    curl -sI -H 'Accept-Encoding: gzip' localhost:8000/news.xml
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MARKER        = "build.json"
+POLL_SECONDS  = 5
+CACHE_CONTROL = "no-cache"  # always revalidate; a 304 costs next to nothing
+CONTENT_TYPES = {
+    ".xml":  "application/rss+xml; charset=utf-8",
+    ".json": "application/feed+json; charset=utf-8",
+}
+ENCODINGS = {"br": ".br", "gzip": ".gz"}  # in order of preference
+
+
+class Document:
+    """One published file: its bodies by content-encoding and their ETags."""
+
+    def __init__(self, path):
+        data   = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.content_type = CONTENT_TYPES.get(path.suffix, "application/octet-stream")
+        self.bodies = {"identity": data}
+        self.etags  = {"identity": f'"{digest}"'}
+        for encoding, suffix in ENCODINGS.items():
+            variant = path.with_name(path.name + suffix)
+            if variant.exists():
+                self.bodies[encoding] = variant.read_bytes()
+                self.etags[encoding]  = f'"{digest}-{encoding}"'
+
+
+class Build:
+    """Every document of one pipeline run, keyed by URL path."""
+
+    def __init__(self, output_dir):
+        marker = json.loads((output_dir / MARKER).read_text(encoding="utf-8"))
+        self.built_at  = marker["built_at"]
+        self.documents = {}
+        for name in marker["files"]:
+            path = output_dir / name
+            if path.exists():
+                self.documents["/" + name] = Document(path)
+
+
+def negotiate(accept_encoding, available):
+    """Pick br or gzip if the client accepts it (q > 0) and a variant exists, else identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison, as If-None-Match requires: W/ prefixes are ignored, * matches anything."""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    server_version   = "rss-digest"
+    protocol_version = "HTTP/1.1"  # every response has a Content-Length, so connections can be reused
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def respond(self, send_body):
+        build = self.server.build  # one read, so the whole response comes from the same build
+        path  = self.path.split("?", 1)[0]
+        doc   = build.documents.get(path) if build else None
+        if doc is None:
+            self.send_error(404)
+            return
+
+        encoding = negotiate(self.headers.get("Accept-Encoding"), doc.bodies)
+        etag     = doc.etags[encoding]
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_common_headers(etag)
+            self.end_headers()
+            return
+
+        body = doc.bodies[encoding]
+        self.send_response(200)
+        self.send_header("Content-Type", doc.content_type)
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_common_headers(etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_common_headers(self, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", CACHE_CONTROL)
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, output_dir):
+        super().__init__(address, FeedHandler)
+        self.output_dir = Path(output_dir)
+        self.build      = None
+        self.marker     = None
+        self.reload()
+
+    def reload(self):
+        """Load a new build if build.json has changed since the last one. Returns True if it swapped."""
+        try:
+            stat = (self.output_dir / MARKER).stat()
+        except FileNotFoundError:
+            return False
+        marker = (stat.st_mtime_ns, stat.st_size)
+        if marker == self.marker:
+            return False
+        try:
+            build = Build(self.output_dir)
+        except Exception as e:
+            print(f"  Could not load build: {e} — keeping the current one")
+            return False
+        self.build, self.marker = build, marker
+        print(f"Serving build {build.built_at} ({len(build.documents)} files)")
+        return True
+
+    def watch(self, interval=POLL_SECONDS):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reload()
+        threading.Thread(target=loop, daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dir", default="output", help="Pipeline output directory (default: output)")
+    args = parser.parse_args()
+
+    server = FeedServer((args.host, args.port), args.dir)
+    if server.build is None:
+        print(f"No {MARKER} in {args.dir} yet — run pipeline.py; serving 404s until it appears")
+    server.watch()
+    print(f"Listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
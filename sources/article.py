@@ -0,0 +1,94 @@
+"""
+article.py — The record every source produces and every pipeline stage passes along
+
+Dates are carried as integer epoch seconds (pub_ts, added_ts), so date filtering
+and archive pruning are plain integer comparisons. The RFC 822 / ISO strings the
+archive and RSS output use are derived from them on the way out.
+"""
+
+import sys
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+
+RFC822 = "%a, %d %b %Y %H:%M:%S +0000"
+
+
+def rfc822(ts):
+    """Format an epoch as an RFC 822 date, or '' for None."""
+    if ts is None:
+        return ""
+    return datetime.fromtimestamp(ts, UTC).strftime(RFC822)
+
+
+@dataclass(slots=True)
+class Article:
+    guid:       str
+    source:     str
+    title:      str
+    desc:       str
+    link:       str
+    image:      str | None = None
+    pub_ts:     int | None = None  # publication time from the source, None if it gave none
+    added_ts:   int | None = None  # when the article entered the archive
+    reason:     str = ""           # Claude's one-sentence reason, for filtered feeds
+    media_type: str = ""           # Game/Film/Book/TV/Other, for TASTE_PROFILE feeds
+    slot_ts:    int | None = None  # pubDate slot given out in pass 2, kept for the article's lifetime
+    page:       int | None = None  # RFC 5005 archive page the article was moved to, None while current
+
+    def __post_init__(self):
+        # A feed holds hundreds of articles from a handful of sources
+        self.source = sys.intern(self.source)
+
+    @property
+    def pub_date(self):
+        return rfc822(self.pub_ts)
+
+    def to_dict(self):
+        """Convert to the archive layout (output/<feed>_archive.json entries)."""
+        d = {
+            "guid":     self.guid,
+            "source":   self.source,
+            "title":    self.title,
+            "desc":     self.desc,
+            "link":     self.link,
+            "image":    self.image,
+            "pub_date": self.pub_date,
+            "pub_ts":   self.pub_ts,
+        }
+        if self.reason:
+            d["reason"] = self.reason
+        if self.media_type:
+            d["media_type"] = self.media_type
+        if self.added_ts is not None:
+            d["added_at"] = datetime.fromtimestamp(self.added_ts, UTC).isoformat()
+            d["added_ts"] = self.added_ts
+        if self.slot_ts is not None:
+            d["slot_ts"] = self.slot_ts
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build from an archive entry. Older entries without epoch fields have their date strings parsed once here."""
+        pub_ts = d.get("pub_ts")
+        if pub_ts is None and d.get("pub_date"):
+            try:
+                pub_ts = int(parsedate_to_datetime(d["pub_date"]).timestamp())
+            except Exception:
+                pub_ts = None
+        added_ts = d.get("added_ts")
+        if added_ts is None and d.get("added_at"):
+            added_ts = int(datetime.fromisoformat(d["added_at"]).timestamp())
+        return cls(
+            guid=d["guid"],
+            source=d.get("source", ""),
+            title=d.get("title", ""),
+            desc=d.get("desc", ""),
+            link=d.get("link", ""),
+            image=d.get("image"),
+            pub_ts=pub_ts,
+            added_ts=added_ts,
+            reason=d.get("reason", ""),
+            media_type=d.get("media_type", ""),
+            slot_ts=d.get("slot_ts"),
+        )
@@ -1,8 +1,10 @@
 import re
-import requests
 from datetime import datetime, UTC
 from html import unescape
 
+from sources import http_cache, transport
+from sources.article import Article
+
 API_URL = "https://news.blizzard.com/en-us/api/news/starcraft-2?pageSize=20"
 HEADERS = {"User-Agent": "StarCraftPatchesRSS/1.0"}
 
@@ -19,21 +21,32 @@ def _fix_url(url):
     return url or ""
 
 
-def _rfc822(iso_date):
+def _epoch(iso_date):
     if not iso_date:
-        return ""
+        return None
     try:
         dt = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
-        return dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=UTC)
+        return int(dt.timestamp())
     except ValueError:
-        return ""
+        return None
 
 
 class BlizzardSource:
-    def fetch(self) -> list[dict]:
+    name       = "Blizzard"
+    url        = API_URL
+    last_error = None
+
+    def fetch(self, known_guids=frozenset()) -> list[Article]:
+        self.last_error = None
         try:
-            r = requests.get(API_URL, headers=HEADERS, timeout=20)
+            headers = {**HEADERS, **http_cache.conditional_headers(API_URL)}
+            r = transport.get(API_URL, headers=headers)
             r.raise_for_status()
+            if http_cache.not_modified(r):
+                print("  Blizzard: not modified")
+                return []
             items = []
             for entry in r.json().get("feed", {}).get("contentItems", []):
                 props = entry.get("properties", {})
@@ -45,17 +58,19 @@ class BlizzardSource:
                 desc = _clean(props.get("summary", ""))
                 if category:
                     desc = f"[{category}] {desc}"
-                items.append({
-                    "guid":     props.get("newsId", ""),
-                    "source":   "Blizzard",
-                    "title":    title,
-                    "desc":     desc,
-                    "link":     link,
-                    "image":    _fix_url(props.get("staticAsset", {}).get("imageUrl", "")),
-                    "pub_date": _rfc822(props.get("lastUpdated", "")),
-                })
+                items.append(Article(
+                    guid=props.get("newsId", ""),
+                    source="Blizzard",
+                    title=title,
+                    desc=desc,
+                    link=link,
+                    image=_fix_url(props.get("staticAsset", {}).get("imageUrl", "")),
+                    pub_ts=_epoch(props.get("lastUpdated", "")),
+                ))
+            http_cache.remember(API_URL, r)
             print(f"  Blizzard: {len(items)} items")
             return items
         except Exception as e:
             print(f"  Blizzard: failed ({e})")
+            self.last_error = e
             return []
@@ -1,10 +1,12 @@
 import re
 import hashlib
-import requests
 from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, UTC
 from html import unescape
 
+from sources import transport
+from sources.article import Article
+
 URL      = "https://www.shambhalamusicfestival.com/blog"
 BASE_URL = "https://www.shambhalamusicfestival.com"
 HEADERS  = {"User-Agent": "ShambhalaRSS/1.0"}
@@ -16,20 +18,24 @@ def _clean(s):
     return re.sub(r"\s+", " ", unescape(s)).strip()
 
 
-def _rfc822(date_str):
+def _epoch(date_str):
     if not date_str:
-        return ""
+        return None
     try:
         dt = datetime.strptime(date_str.strip(), "%B %d, %Y")
-        return dt.strftime("%a, %d %b %Y 00:00:00 +0000")
+        return int(dt.replace(tzinfo=UTC).timestamp())
     except ValueError:
-        return ""
+        return None
 
 
 class ShambhalaSource:
-    def fetch(self) -> list[dict]:
+    name       = "Shambhala"
+    last_error = None
+
+    def fetch(self, known_guids=frozenset()) -> list[Article]:
+        self.last_error = None
         try:
-            r = requests.get(URL, headers=HEADERS, timeout=20)
+            r = transport.get(URL, headers=HEADERS)
             r.raise_for_status()
             soup = BeautifulSoup(r.text, "html.parser")
             items = []
@@ -81,18 +87,19 @@ class ShambhalaSource:
                         image = img_el.get("src", "")
 
                 guid = hashlib.sha1((title + link).encode()).hexdigest()
-                items.append({
-                    "guid":     guid,
-                    "source":   "Shambhala",
-                    "title":    title,
-                    "desc":     desc,
-                    "link":     link,
-                    "image":    image,
-                    "pub_date": _rfc822(date_str),
-                })
+                items.append(Article(
+                    guid=guid,
+                    source="Shambhala",
+                    title=title,
+                    desc=desc,
+                    link=link,
+                    image=image,
+                    pub_ts=_epoch(date_str),
+                ))
 
             print(f"  Shambhala: {len(items)} posts")
             return items
         except Exception as e:
             print(f"  Shambhala: failed ({e})")
+            self.last_error = e
             return []
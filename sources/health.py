@@ -0,0 +1,80 @@
+"""
+health.py — Persisted per-source health and circuit breakers
+
+Tracks consecutive failures, last success and the next allowed attempt for every
+source across runs. After FAILURE_THRESHOLD failures in a row a source's breaker
+opens and it is skipped until next_attempt; then it gets one cheap probe (a single
+attempt, no retries). A success closes the breaker, a failure re-opens it with
+the backoff doubled, up to MAX_BACKOFF.
+"""
+
+import json
+import time
+import threading
+
+FAILURE_THRESHOLD = 3
+BASE_BACKOFF      = 12 * 3600
+MAX_BACKOFF       = 7 * 86400
+
+CLOSED = "closed"
+OPEN   = "open"
+PROBE  = "probe"
+
+_health = {}
+_lock   = threading.Lock()
+
+
+def load(path):
+    global _health
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    except Exception as e:
+        print(f"  Could not load source health: {e} — starting fresh")
+        data = {}
+    with _lock:
+        _health = data
+
+
+def save(path):
+    with _lock:
+        data = dict(_health)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def check(name, now=None):
+    """Return CLOSED (fetch normally), PROBE (one cheap attempt) or OPEN (skip)."""
+    now = now or time.time()
+    with _lock:
+        entry = _health.get(name)
+    if not entry or entry["failures"] < FAILURE_THRESHOLD:
+        return CLOSED
+    return PROBE if now >= entry["next_attempt"] else OPEN
+
+
+def record(name, error=None, now=None):
+    """Record the outcome of a fetch; error is None on success."""
+    now = now or time.time()
+    with _lock:
+        entry = _health.setdefault(name, {"failures": 0, "last_success": None, "next_attempt": 0})
+        if error is None:
+            entry.update(failures=0, next_attempt=0, last_success=now)
+            entry.pop("last_error", None)
+            return
+        entry["failures"] += 1
+        entry["last_error"] = str(error)[:200]
+        if entry["failures"] >= FAILURE_THRESHOLD:
+            backoff = min(BASE_BACKOFF * 2 ** (entry["failures"] - FAILURE_THRESHOLD), MAX_BACKOFF)
+            entry["next_attempt"] = now + backoff
+
+
+def open_breakers():
+    """Return [(name, entry)] for every source whose breaker is open or due a probe."""
+    with _lock:
+        return sorted(
+            (name, dict(entry)) for name, entry in _health.items()
+            if entry["failures"] >= FAILURE_THRESHOLD
+        )
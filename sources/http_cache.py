@@ -0,0 +1,68 @@
+"""
+http_cache.py — On-disk HTTP validator cache for conditional GETs
+
+Remembers the ETag / Last-Modified a server sent for each URL so the next run can
+ask "has this changed?" with If-None-Match / If-Modified-Since. A 304 answer means
+the source can skip parsing entirely and report no new items.
+
+Validators are only recorded after a response has been parsed successfully, so a
+failed parse never suppresses the next full download.
+"""
+
+import json
+import threading
+
+_validators = {}
+_lock       = threading.Lock()
+
+
+def load(path):
+    """Load cached validators from path, replacing whatever is in memory."""
+    global _validators
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    except Exception as e:
+        print(f"  Could not load HTTP cache: {e} — starting fresh")
+        data = {}
+    with _lock:
+        _validators = data
+
+
+def save(path, skip=()):
+    """Write validators to path, leaving out the URLs in skip so they're fetched in full next run."""
+    with _lock:
+        data = {url: v for url, v in _validators.items() if url not in skip}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def conditional_headers(url):
+    """Return If-None-Match / If-Modified-Since headers for url, or {} if nothing is cached."""
+    with _lock:
+        entry = _validators.get(url)
+    if not entry:
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def remember(url, response):
+    """Record the validators from a successful 200 response."""
+    etag          = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    with _lock:
+        if etag or last_modified:
+            _validators[url] = {"etag": etag, "last_modified": last_modified}
+        else:
+            _validators.pop(url, None)
+
+
+def not_modified(response):
+    return response.status_code == 304
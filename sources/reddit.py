@@ -1,9 +1,11 @@
 import re
 import hashlib
-import requests
-import xml.etree.ElementTree as ET
 from html import unescape
 
+from sources import http_cache, transport
+from sources.article import Article
+from sources.rss import ATOM_NS, CHUNK_SIZE, iter_feed_entries, parse_entries
+
 HEADERS = {"User-Agent": "python:rss-digest:v1.0 (by /u/frownigami)"}
 
 
@@ -19,45 +21,59 @@ class RedditSource:
     def __init__(self, subreddit: str, max_items: int = 25):
         self.subreddit = subreddit
         self.max_items = max_items
+        self.name = f"r/{subreddit}"
+        self.url = f"https://www.reddit.com/r/{subreddit}/.rss?limit={max_items}"
+        self.last_error = None
+
+    def _entry(self, entry):
+        ns      = {"atom": ATOM_NS}
+        title   = _clean(entry.findtext("atom:title", "", ns))
+        link_el = entry.find("atom:link", ns)
+        link    = link_el.attrib.get("href", "") if link_el is not None else ""
+        content = entry.find("atom:content", ns)
+        desc    = _clean(content.text if content is not None else "")[:300]
+
+        image = None
+        thumb = entry.find("{http://search.yahoo.com/mrss/}thumbnail")
+        if thumb is not None:
+            image = thumb.attrib.get("url")
+        elif content is not None and content.text and 'img src="' in content.text:
+            match = re.search(r'<img src="([^"]+)"', content.text)
+            if match:
+                image = match.group(1)
+
+        if not title:
+            return None
+        return Article(
+            guid=hashlib.sha1(link.encode()).hexdigest(),
+            source=f"r/{self.subreddit}",
+            title=title,
+            desc=desc,
+            link=link,
+            image=image,
+        )
 
-    def fetch(self) -> list[dict]:
-        url = f"https://www.reddit.com/r/{self.subreddit}/.rss?limit={self.max_items}"
+    def fetch(self, known_guids=frozenset()) -> list[Article]:
+        """Stream the listing up to max_items. It is sorted by hot, not by date, so known_guids
+        can't end the parse early: a new post may sit below archived ones."""
+        url = self.url
+        self.last_error = None
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
-            r.raise_for_status()
-            root = ET.fromstring(r.content)
-            ns = {"atom": "http://www.w3.org/2005/Atom"}
-            items = []
-
-            for entry in root.findall("atom:entry", ns):
-                title   = _clean(entry.findtext("atom:title", "", ns))
-                link_el = entry.find("atom:link", ns)
-                link    = link_el.attrib.get("href", "") if link_el is not None else ""
-                content = entry.find("atom:content", ns)
-                desc    = _clean(content.text if content is not None else "")[:300]
-
-                image = None
-                thumb = entry.find("{http://search.yahoo.com/mrss/}thumbnail")
-                if thumb is not None:
-                    image = thumb.attrib.get("url")
-                elif content is not None and content.text and 'img src="' in content.text:
-                    match = re.search(r'<img src="([^"]+)"', content.text)
-                    if match:
-                        image = match.group(1)
-
-                if title:
-                    items.append({
-                        "guid":     hashlib.sha1(link.encode()).hexdigest(),
-                        "source":   f"r/{self.subreddit}",
-                        "title":    title,
-                        "desc":     desc,
-                        "link":     link,
-                        "image":    image,
-                        "pub_date": "",
-                    })
+            headers = {**HEADERS, **http_cache.conditional_headers(url)}
+            with transport.get(url, headers=headers, stream=True) as r:
+                r.raise_for_status()
+                if http_cache.not_modified(r):
+                    print(f"  r/{self.subreddit}: not modified")
+                    return []
+                items = parse_entries(
+                    iter_feed_entries(r.iter_content(CHUNK_SIZE)),
+                    self._entry, self.max_items,
+                )
 
+            http_cache.remember(url, r)
             print(f"  r/{self.subreddit}: {len(items)} posts")
             return items
         except Exception as e:
             print(f"  r/{self.subreddit}: failed ({e})")
+            self.last_error = e
             return []
@@ -1,51 +1,51 @@
 import re
-import time
 import hashlib
-import cloudscraper
 import xml.etree.ElementTree as ET
 from html import unescape
 from email.utils import parsedate_to_datetime
 from datetime import timezone
 
+from sources import http_cache, transport
+from sources.article import Article
+
 MEDIA_NS   = "http://search.yahoo.com/mrss/"
 CONTENT_NS = "http://purl.org/rss/1.0/modules/content/"
+ATOM_NS    = "http://www.w3.org/2005/Atom"
+ENTRY_TAGS = {"item", f"{{{ATOM_NS}}}entry"}
+CHUNK_SIZE       = 16384
+HEAD_LIMIT       = 65536  # give up looking for the root tag after this many bytes
+STOP_AFTER_KNOWN = 3      # consecutive archived articles before a streamed parse stops
 HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     "Accept-Language": "en-US,en;q=0.9",
     "Referer": "https://www.google.com/",
 }
 
-_scraper = cloudscraper.create_scraper(
-    browser={"browser": "chrome", "platform": "windows", "mobile": False}
-)
-
-
-def _parse_date(text):
-    """Parse RFC 822, ISO 8601, or informal date strings → RFC 822 string, or '' on failure."""
+def _parse_ts(text):
+    """Parse RFC 822, ISO 8601, or informal date strings → epoch seconds, or None on failure."""
     if not text:
-        return ""
+        return None
     from datetime import datetime
     text = text.strip()
     try:
-        dt = parsedate_to_datetime(text)
-        return dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+        return int(parsedate_to_datetime(text).timestamp())
     except Exception:
         pass
     try:
         dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
         if dt.tzinfo is None:
             dt = dt.replace(tzinfo=timezone.utc)
-        return dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+        return int(dt.timestamp())
     except Exception:
         pass
     # Handle informal format: "Mon, Jan 5 2024" (Three Word Phrase)
     for fmt in ("%a, %b %d %Y", "%b %d %Y", "%B %d %Y"):
         try:
             dt = datetime.strptime(text, fmt)
-            return dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+            return int(dt.replace(tzinfo=timezone.utc).timestamp())
         except Exception:
             pass
-    return ""
+    return None
 
 
 def _clean(text):
@@ -77,10 +77,72 @@ def _extract_image(item):
     return None
 
 
+def _declare_media_ns(head):
+    """Add xmlns:media to the root tag if it isn't declared there. Returns None until the root tag is complete."""
+    m = re.search(rb"<(?:rss|feed)\b[^>]*>", head)
+    if not m:
+        return None
+    if b"xmlns:media" in m.group(0):
+        return head
+    end = m.end() - (2 if m.group(0).endswith(b"/>") else 1)
+    return head[:end] + b' xmlns:media="http://search.yahoo.com/mrss/"' + head[end:]
+
+
+def iter_feed_entries(chunks):
+    """Incrementally parse an RSS or Atom document, yielding each <item> / <entry> as it closes.
+
+    Some feeds use the media: prefix without declaring it, so the declaration is
+    added to the root tag as the head of the stream goes by; the rest of the body
+    is fed to the parser untouched. Each yielded element is cleared once the caller
+    resumes, so memory stays flat however long the feed is.
+    """
+    parser = ET.XMLPullParser(events=("end",))
+    head   = b""
+    for chunk in chunks:
+        if head is not None:
+            head += chunk
+            fixed = _declare_media_ns(head)
+            if fixed is None and len(head) < HEAD_LIMIT:
+                continue
+            chunk, head = fixed or head, None
+        parser.feed(chunk)
+        for _, el in parser.read_events():
+            if el.tag in ENTRY_TAGS:
+                yield el
+                el.clear()
+    if head:
+        parser.feed(head)
+    parser.close()
+    for _, el in parser.read_events():
+        if el.tag in ENTRY_TAGS:
+            yield el
+
+
+def parse_entries(entries, build, max_items, known_guids=frozenset()):
+    """Turn streamed entry elements into Articles.
+
+    Stops after max_items entries, or once STOP_AFTER_KNOWN articles in a row are
+    in known_guids. Only pass known_guids for feeds that list newest first, where
+    everything after that run is archived too; in a feed sorted any other way a
+    new article can sit below old ones. A single known article doesn't stop the
+    parse, since pinned posts sit at the top.
+    """
+    items = []
+    known_run = 0
+    for n, el in enumerate(entries, start=1):
+        article = build(el)
+        if article:
+            items.append(article)
+            known_run = known_run + 1 if article.guid in known_guids else 0
+        if n >= max_items or known_run >= STOP_AFTER_KNOWN:
+            break
+    return items
+
+
 def _fetch_page_image(url, element_id=None):
     """Fetch a linked page and extract an image, optionally scoped to an element id."""
     try:
-        r = _scraper.get(url, headers=HEADERS, timeout=10)
+        r = transport.get(url, headers=HEADERS, cloudflare=True, timeout=10, attempts=1)
         r.raise_for_status()
         html = r.text
         if element_id:
@@ -95,83 +157,88 @@ def _fetch_page_image(url, element_id=None):
 class RSSSource:
     def __init__(self, name: str, url: str, max_items: int = 30,
                  fallback_image: str = None, fetch_page_image: bool = False,
-                 page_image_id: str = None):
+                 page_image_id: str = None, chronological: bool = False):
         self.name = name
         self.url = url
         self.max_items = max_items
         self.fallback_image = fallback_image
         self.fetch_page_image = fetch_page_image
         self.page_image_id = page_image_id
-
-    def fetch(self) -> list[dict]:
+        self.chronological = chronological  # newest first, so a run of archived GUIDs ends the parse
+        self.last_error = None
+
+    def enrich(self, articles: list[Article]) -> None:
+        """Scrape the linked page for an image on this source's articles that have none.
+
+        Runs on the fetch worker, on the items that are new and recent enough to keep,
+        so articles we already have never cost a page fetch.
+        """
+        if not self.fetch_page_image:
+            return
+        for a in articles:
+            if a.source == self.name and not a.image:
+                a.image = _fetch_page_image(a.link, self.page_image_id)
+
+    def _rss_item(self, item):
+        title = _clean(item.findtext("title") or "")
+        desc  = _clean(item.findtext("description") or "")
+        link  = (item.findtext("link") or "").strip()
+        if not title:
+            title = self.name
+        if not link:
+            return None
+        return Article(
+            guid=hashlib.sha1(link.encode()).hexdigest(),
+            source=self.name,
+            title=title,
+            desc=desc[:300],
+            link=link,
+            image=_extract_image(item) or self.fallback_image,
+            pub_ts=_parse_ts(item.findtext("pubDate") or ""),
+        )
+
+    def _atom_entry(self, entry):
+        ns      = {"atom": ATOM_NS}
+        title   = _clean(entry.findtext("atom:title", "", ns))
+        summary = _clean(entry.findtext("atom:summary", "", ns) or entry.findtext("atom:content", "", ns) or "")
+        link_el = entry.find("atom:link", ns)
+        link    = link_el.attrib.get("href", "") if link_el is not None else ""
+        if not title:
+            return None
+        atom_date = (
+            entry.findtext("atom:published", "", ns)
+            or entry.findtext("atom:updated", "", ns)
+        )
+        return Article(
+            guid=hashlib.sha1(link.encode()).hexdigest(),
+            source=self.name,
+            title=title,
+            desc=summary[:300],
+            link=link,
+            image=_extract_image(entry) or self.fallback_image,
+            pub_ts=_parse_ts(atom_date),
+        )
+
+    def fetch(self, known_guids=frozenset()) -> list[Article]:
+        """Stream the feed, stopping after max_items entries or, for chronological feeds, a run of already-known GUIDs."""
+        self.last_error = None
         try:
-            last_err = None
-            for attempt in range(3):
-                try:
-                    r = _scraper.get(self.url, headers=HEADERS, timeout=15)
-                    r.raise_for_status()
-                    break
-                except Exception as e:
-                    last_err = e
-                    if attempt < 2:
-                        time.sleep(3)
-            else:
-                raise last_err
-            content = r.content
-            # Some feeds use media: prefix without declaring xmlns:media
-            if b"media:" in content and b"xmlns:media" not in content:
-                content = re.sub(
-                    rb"(<(?:rss|feed)[^>]*)",
-                    rb'\1 xmlns:media="http://search.yahoo.com/mrss/"',
-                    content, count=1,
+            headers = {**HEADERS, **http_cache.conditional_headers(self.url)}
+            with transport.get(self.url, headers=headers, stream=True, cloudflare=True) as r:
+                r.raise_for_status()
+                if http_cache.not_modified(r):
+                    print(f"  {self.name}: not modified")
+                    return []
+                items = parse_entries(
+                    iter_feed_entries(r.iter_content(CHUNK_SIZE)),
+                    lambda el: self._rss_item(el) if el.tag == "item" else self._atom_entry(el),
+                    self.max_items, known_guids if self.chronological else frozenset(),
                 )
-            root = ET.fromstring(content)
-            items = []
-
-            for item in root.findall(".//item")[:self.max_items]:
-                title = _clean(item.findtext("title") or "")
-                desc  = _clean(item.findtext("description") or "")
-                link  = (item.findtext("link") or "").strip()
-                if not title:
-                    title = self.name
-                if link:
-                    image = _extract_image(item) or self.fallback_image
-                    if not image and self.fetch_page_image:
-                        image = _fetch_page_image(link, self.page_image_id)
-                    items.append({
-                        "guid":     hashlib.sha1(link.encode()).hexdigest(),
-                        "source":   self.name,
-                        "title":    title,
-                        "desc":     desc[:300],
-                        "link":     link,
-                        "image":    image,
-                        "pub_date": _parse_date(item.findtext("pubDate") or ""),
-                    })
-
-            if not items:
-                ns = {"atom": "http://www.w3.org/2005/Atom"}
-                for entry in root.findall("atom:entry", ns)[:self.max_items]:
-                    title   = _clean(entry.findtext("atom:title", "", ns))
-                    summary = _clean(entry.findtext("atom:summary", "", ns) or entry.findtext("atom:content", "", ns) or "")
-                    link_el = entry.find("atom:link", ns)
-                    link    = link_el.attrib.get("href", "") if link_el is not None else ""
-                    if title:
-                        atom_date = (
-                            entry.findtext("atom:published", "", ns)
-                            or entry.findtext("atom:updated", "", ns)
-                        )
-                        items.append({
-                            "guid":     hashlib.sha1(link.encode()).hexdigest(),
-                            "source":   self.name,
-                            "title":    title,
-                            "desc":     summary[:300],
-                            "link":     link,
-                            "image":    _extract_image(entry) or self.fallback_image,
-                            "pub_date": _parse_date(atom_date),
-                        })
 
+            http_cache.remember(self.url, r)
             print(f"  {self.name}: {len(items)} articles")
             return items
         except Exception as e:
             print(f"  {self.name}: failed ({e})")
+            self.last_error = e
             return []
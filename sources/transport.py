@@ -0,0 +1,185 @@
+"""
+transport.py — Shared HTTP layer for every source and loader
+
+All outbound requests (feeds, page images, Notion, Goodreads) go through here:
+  - one keep-alive session per host, so repeat requests reuse the TLS connection
+  - per-host concurrency cap and minimum spacing between requests
+  - a central timeout and retry policy, overridable per host in HOST_POLICIES
+  - hosts fetched with cloudflare=True get a cloudscraper session instead of a
+    plain requests one; its clearance cookies and User-Agent (the clearance is
+    bound to it) can be saved between runs with save_sessions / load_sessions
+
+Retries cover exceptions (connection errors, timeouts, failed Cloudflare
+challenges) and 429/5xx responses; any other status is returned as-is for the
+caller to raise_for_status().
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import cloudscraper
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES  = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30  # seconds; longer waits aren't worth holding the run for
+SESSION_MAX_AGE = 7 * 86400  # saved Cloudflare sessions older than this are discarded
+
+DEFAULT_POLICY = {
+    "concurrency":  4,     # requests in flight to one host
+    "min_interval": 0.0,   # seconds between request starts to one host
+    "timeout":      15,
+    "attempts":     3,
+    "backoff":      3,     # seconds before a retry, unless the server sends Retry-After
+}
+
+HOST_POLICIES = {
+    "www.reddit.com":                 {"concurrency": 1, "min_interval": 2.0, "timeout": 10},
+    "api.notion.com":                 {"concurrency": 3, "min_interval": 0.35, "timeout": 10},
+    "news.blizzard.com":              {"timeout": 20},
+    "www.shambhalamusicfestival.com": {"timeout": 20},
+}
+
+
+class _Host:
+    """Session and politeness state for one (host, cloudflare) pair."""
+
+    def __init__(self, host, cloudflare, saved=None):
+        self.policy = {**DEFAULT_POLICY, **HOST_POLICIES.get(host, {})}
+        if cloudflare:
+            self.session = cloudscraper.create_scraper(
+                browser={"browser": "chrome", "platform": "windows", "mobile": False}
+            )
+            if saved:
+                self.session.headers["User-Agent"] = saved["user_agent"]
+                for c in saved["cookies"]:
+                    self.session.cookies.set(
+                        c["name"], c["value"], domain=c["domain"], path=c["path"],
+                        expires=c["expires"], secure=c["secure"],
+                    )
+        else:
+            self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.policy["concurrency"])
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.slots      = threading.BoundedSemaphore(self.policy["concurrency"])
+        self.lock       = threading.Lock()
+        self.next_start = 0.0
+
+    def wait_turn(self):
+        with self.lock:
+            now   = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.policy["min_interval"]
+        if start > now:
+            time.sleep(start - now)
+
+
+class Transport:
+    def __init__(self):
+        self.hosts = {}
+        self.saved = {}  # host → Cloudflare session state from a previous run
+        self.lock  = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def single_attempt(self):
+        """Within this block, requests made on the current thread are not retried."""
+        self.local.single = True
+        try:
+            yield
+        finally:
+            self.local.single = False
+
+    def host(self, url, cloudflare=False):
+        key = (urlsplit(url).hostname or "", cloudflare)
+        with self.lock:
+            if key not in self.hosts:
+                saved = self.saved.get(key[0]) if cloudflare else None
+                self.hosts[key] = _Host(key[0], cloudflare, saved)
+            return self.hosts[key]
+
+    def load_sessions(self, path):
+        """Load saved Cloudflare sessions; each host's is applied when that host is first used."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"  Could not load Cloudflare sessions: {e} — starting fresh")
+            return
+        now = time.time()
+        with self.lock:
+            self.saved = {
+                host: state for host, state in saved.items()
+                if now - state["saved_at"] < SESSION_MAX_AGE
+            }
+
+    def save_sessions(self, path):
+        """Save unexpired cookies and the User-Agent of every Cloudflare session, keeping
+        still-fresh entries for hosts this run didn't touch."""
+        now = time.time()
+        with self.lock:
+            state = dict(self.saved)
+            for (host, cloudflare), h in self.hosts.items():
+                if not cloudflare:
+                    continue
+                cookies = [
+                    {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                     "expires": c.expires, "secure": c.secure}
+                    for c in h.session.cookies
+                    if c.expires and c.expires > now
+                ]
+                if cookies:
+                    state[host] = {
+                        "user_agent": h.session.headers.get("User-Agent", ""),
+                        "cookies":    cookies,
+                        "saved_at":   now,
+                    }
+                else:
+                    state.pop(host, None)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+
+    def request(self, method, url, cloudflare=False, attempts=None, **kwargs):
+        host     = self.host(url, cloudflare)
+        policy   = host.policy
+        attempts = 1 if getattr(self.local, "single", False) else attempts or policy["attempts"]
+        kwargs.setdefault("timeout", policy["timeout"])
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            with host.slots:
+                host.wait_turn()
+                try:
+                    r = host.session.request(method, url, **kwargs)
+                except Exception:
+                    if last:
+                        raise
+                    r = None
+            if r is not None and (r.status_code not in RETRY_STATUSES or last):
+                return r
+            delay = policy["backoff"]
+            if r is not None:
+                retry_after = r.headers.get("Retry-After", "")
+                delay = min(float(retry_after), MAX_RETRY_AFTER) if retry_after.isdigit() else delay
+                r.close()
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+_transport = Transport()
+get     = _transport.get
+post    = _transport.post
+request = _transport.request
+load_sessions = _transport.load_sessions
+single_attempt = _transport.single_attempt
+save_sessions = _transport.save_sessions
@@ -0,0 +1,207 @@
+"""
+store.py — SQLite-backed rolling archive shared by every feed
+
+Replaces rewriting output/<feed>_archive.json on every run. Articles live in one
+table keyed by (feed, guid), with their archive-time epoch in an indexed column,
+so each run only touches the rows it adds or prunes:
+
+  articles(feed, guid, added_at REAL, data TEXT, slot_ts INTEGER, page INTEGER)
+                                                    -- data is Article.to_dict() as JSON,
+                                                    -- slot_ts the pass-2 pubDate slot,
+                                                    -- page the RFC 5005 archive page (or NULL)
+
+  signatures(feed, guid, added_at REAL, sig BLOB)  -- MinHash signature (neardup.py)
+  lsh(feed, bucket INTEGER, guid)                   -- one row per LSH band
+  pages(feed, last INTEGER)                         -- highest archive page number given out
+
+load() returns the feed's Articles newest first, and export_json() writes the
+legacy JSON layout back out for anything still reading the old files. Signatures
+are pruned on the same schedule as the articles they were taken from; prune() can
+be told to spare whole archive pages.
+"""
+
+import json
+import sqlite3
+from array import array
+from datetime import datetime, UTC
+
+from sources.article import Article
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    feed     TEXT NOT NULL,
+    guid     TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    data     TEXT NOT NULL,
+    slot_ts  INTEGER,
+    page     INTEGER,
+    PRIMARY KEY (feed, guid)
+);
+CREATE INDEX IF NOT EXISTS articles_added_at ON articles (feed, added_at);
+CREATE TABLE IF NOT EXISTS signatures (
+    feed     TEXT NOT NULL,
+    guid     TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    sig      BLOB NOT NULL,
+    PRIMARY KEY (feed, guid)
+);
+CREATE TABLE IF NOT EXISTS lsh (
+    feed   TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    guid   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lsh_bucket ON lsh (feed, bucket);
+CREATE INDEX IF NOT EXISTS lsh_guid ON lsh (feed, guid);
+CREATE TABLE IF NOT EXISTS pages (
+    feed TEXT PRIMARY KEY,
+    last INTEGER NOT NULL
+);
+"""
+
+
+class ArticleStore:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(str(path))
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(articles)")}
+        for column in ("slot_ts", "page"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE articles ADD COLUMN {column} INTEGER")
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def count(self, feed):
+        return self.conn.execute("SELECT COUNT(*) FROM articles WHERE feed = ?", (feed,)).fetchone()[0]
+
+    def guids(self, feed):
+        """Return every GUID archived for feed (read from the primary-key index)."""
+        return {row[0] for row in self.conn.execute("SELECT guid FROM articles WHERE feed = ?", (feed,))}
+
+    def known_guids(self, feed, guids):
+        """Return the subset of guids already archived for feed."""
+        return self._existing("articles", feed, guids)
+
+    def _existing(self, table, feed, guids):
+        guids = list(guids)
+        known = set()
+        for i in range(0, len(guids), 500):
+            chunk = guids[i:i + 500]
+            rows  = self.conn.execute(
+                f"SELECT guid FROM {table} WHERE feed = ? AND guid IN ({','.join('?' * len(chunk))})",
+                (feed, *chunk),
+            )
+            known.update(row[0] for row in rows)
+        return known
+
+    def add(self, feed, articles, now=None):
+        """Archive new articles, stamping each with added_ts. Articles already archived are left alone."""
+        now = int(now if now is not None else datetime.now(UTC).timestamp())
+        for a in articles:
+            a.added_ts = now
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO articles (feed, guid, added_at, data) VALUES (?, ?, ?, ?)",
+            [(feed, a.guid, now, json.dumps(a.to_dict(), ensure_ascii=False)) for a in articles],
+        )
+
+    def prune(self, feed, cutoff, keep_pages=()):
+        """Delete articles (and signatures) archived at or before the cutoff epoch, except those on the
+        archive pages in keep_pages. Returns how many articles were removed."""
+        keep = list(keep_pages)
+        cur  = self.conn.execute(
+            "DELETE FROM articles WHERE feed = ? AND added_at <= ? "
+            f"AND (page IS NULL OR page NOT IN ({','.join('?' * len(keep))}))",
+            (feed, cutoff, *keep),
+        )
+        self.conn.execute(
+            "DELETE FROM lsh WHERE feed = ? AND guid IN "
+            "(SELECT guid FROM signatures WHERE feed = ? AND added_at <= ?)", (feed, feed, cutoff),
+        )
+        self.conn.execute("DELETE FROM signatures WHERE feed = ? AND added_at <= ?", (feed, cutoff))
+        return cur.rowcount
+
+    def add_signatures(self, feed, rows, now=None):
+        """Index [(guid, signature, buckets)] for near-duplicate lookups. GUIDs already indexed are left alone."""
+        now     = int(now if now is not None else datetime.now(UTC).timestamp())
+        indexed = self._existing("signatures", feed, [guid for guid, _, _ in rows])
+        rows    = [r for r in rows if r[0] not in indexed]
+        self.conn.executemany(
+            "INSERT INTO signatures (feed, guid, added_at, sig) VALUES (?, ?, ?, ?)",
+            [(feed, guid, now, sig.tobytes()) for guid, sig, _ in rows],
+        )
+        self.conn.executemany(
+            "INSERT INTO lsh (feed, bucket, guid) VALUES (?, ?, ?)",
+            [(feed, b, guid) for guid, _, keys in rows for b in keys],
+        )
+
+    def similar(self, feed, buckets):
+        """Return {guid: signature} for every indexed article sharing at least one LSH bucket."""
+        rows = self.conn.execute(
+            "SELECT s.guid, s.sig FROM signatures s WHERE s.feed = ? AND s.guid IN "
+            f"(SELECT guid FROM lsh WHERE feed = ? AND bucket IN ({','.join('?' * len(buckets))}))",
+            (feed, feed, *buckets),
+        )
+        return {guid: array("Q", sig) for guid, sig in rows}
+
+    def set_slots(self, feed, slots):
+        """Record pass-2 pubDate slots, {guid: epoch}."""
+        self.conn.executemany(
+            "UPDATE articles SET slot_ts = ? WHERE feed = ? AND guid = ?",
+            [(ts, feed, guid) for guid, ts in slots.items()],
+        )
+
+    def set_pages(self, feed, pages):
+        """Record the archive page articles were moved to, {guid: page number}."""
+        self.conn.executemany(
+            "UPDATE articles SET page = ? WHERE feed = ? AND guid = ?",
+            [(n, feed, guid) for guid, n in pages.items()],
+        )
+
+    def last_page(self, feed):
+        """Highest archive page number ever given out for feed (0 if none), even if since pruned."""
+        row = self.conn.execute("SELECT last FROM pages WHERE feed = ?", (feed,)).fetchone()
+        return row[0] if row else 0
+
+    def set_last_page(self, feed, n):
+        self.conn.execute(
+            "INSERT INTO pages (feed, last) VALUES (?, ?) ON CONFLICT (feed) DO UPDATE SET last = excluded.last",
+            (feed, n),
+        )
+
+    def page_sizes(self, feed):
+        """Return {page number: (article count, newest added_at)} for the feed's archive pages."""
+        rows = self.conn.execute(
+            "SELECT page, COUNT(*), MAX(added_at) FROM articles WHERE feed = ? AND page IS NOT NULL GROUP BY page",
+            (feed,),
+        )
+        return {page: (count, newest) for page, count, newest in rows}
+
+    def load(self, feed):
+        """Return the feed's archive as Articles, newest first (ties keep the order they were added in)."""
+        rows = self.conn.execute(
+            "SELECT data, slot_ts, page FROM articles WHERE feed = ? ORDER BY added_at DESC, rowid ASC", (feed,)
+        )
+        articles = []
+        for data, slot_ts, page in rows:
+            a = Article.from_dict(json.loads(data))
+            a.slot_ts = slot_ts
+            a.page    = page
+            articles.append(a)
+        return articles
+
+    def import_json(self, feed, archive):
+        """Load a legacy JSON archive list (newest first) into the store, keeping its added_at times."""
+        articles = [Article.from_dict(d) for d in archive]
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO articles (feed, guid, added_at, data, slot_ts) VALUES (?, ?, ?, ?, ?)",
+            [(feed, a.guid, a.added_ts, json.dumps(a.to_dict(), ensure_ascii=False), a.slot_ts) for a in articles],
+        )
+
+    def export_json(self, feed, path):
+        """Write the feed's archive in the legacy output/<feed>_archive.json layout."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([a.to_dict() for a in self.load(feed)], f, ensure_ascii=False, indent=2)